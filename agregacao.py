@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from calculo_tributos import COLUNAS_XML, resumo_de_totais
+
+
+class AgregadorResumo:
+    """Totais por tributo mantidos de forma incremental, por arquivo.
+
+    Cada arquivo (identificado por uma chave, como o hash do conteúdo) tem seu
+    subtotal das COLUNAS_XML. Adicionar ou remover um arquivo atualiza o total
+    geral sem percorrer novamente os itens dos demais arquivos. `perfil`
+    identifica os parâmetros do cálculo (alíquotas, tabela por NCM): com outro
+    perfil, os subtotais deixam de valer e o agregador deve ser recriado.
+    """
+
+    def __init__(self, perfil=None):
+        self.perfil = perfil
+        self._subtotais = {}
+        self._itens = {}
+        self._total = np.zeros(len(COLUNAS_XML))
+
+    def __contains__(self, chave):
+        return chave in self._subtotais
+
+    def __len__(self):
+        return len(self._subtotais)
+
+    @property
+    def chaves(self):
+        return list(self._subtotais)
+
+    @property
+    def total_itens(self):
+        return sum(self._itens.values())
+
+    def adicionar(self, chave, itens):
+        """Acumula itens calculados (DataFrame ou array n x COLUNAS_XML) no arquivo."""
+        if isinstance(itens, pd.DataFrame):
+            itens = itens[COLUNAS_XML].to_numpy()
+        soma = np.asarray(itens, dtype=np.float64).sum(axis=0)
+        self._subtotais[chave] = self._subtotais.get(chave, 0.0) + soma
+        self._itens[chave] = self._itens.get(chave, 0) + len(itens)
+        self._total = self._total + soma
+
+    def remover(self, chave):
+        if chave not in self._subtotais:
+            return
+        del self._subtotais[chave]
+        del self._itens[chave]
+        # Refaz o total a partir dos subtotais (um por arquivo) para não
+        # acumular erro de ponto flutuante com subtrações sucessivas.
+        self._total = np.sum(list(self._subtotais.values()), axis=0) if self._subtotais else np.zeros(len(COLUNAS_XML))
+
+    def manter_somente(self, chaves):
+        """Remove os arquivos cujas chaves não estão em `chaves`."""
+        chaves = set(chaves)
+        for chave in [c for c in self._subtotais if c not in chaves]:
+            self.remover(chave)
+
+    def totais(self):
+        return pd.Series(self._total, index=COLUNAS_XML)
+
+    def subtotais(self):
+        """Subtotais por arquivo, um por linha."""
+        return pd.DataFrame.from_dict(self._subtotais, orient="index", columns=COLUNAS_XML)
+
+    def resumo(self):
+        """Tabela no formato de df_resumo_xml, com a linha TOTAL."""
+        return resumo_de_totais(self.totais())
@@ -1,15 +1,73 @@
+import time
+
+# Medido antes das demais importações para reportar o custo delas a cada
+# execução (na primeira execução do processo os módulos são carregados; nas
+# seguintes já estão em sys.modules). altair, fpdf e xlsxwriter não entram
+# aqui: são importados sob demanda por graficos, relatorio_pdf e exportacao.
+inicio_script = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
-import xml.etree.ElementTree as ET
 from datetime import datetime
 from io import BytesIO
-import altair as alt
-from fpdf import FPDF
-import base64
+import os
+import tempfile
+
+from calculo_tributos import (
+    COLUNA_ANTES,
+    COLUNA_APOS,
+    Aliquotas,
+    OperacaoImportacao,
+    aliquotas_efetivas,
+    concatenar_aliquotas,
+    calcular_itens_xml,
+    comparativo_simulacao as calcular_comparativo,
+    custo_total_importacao,
+)
+from agregacao import AgregadorResumo
+from armazenamento import ERROS_BASE, VARIAVEL_RAIZ, assinatura, existe_base, gravar_itens, ler_colunas_base, particoes, raiz_do_ambiente
+from cache_itens import CacheLRU, hash_conteudo
+from cenarios import Distribuicao, equilibrio_ibs_cbs, faixa, simular_monte_carlo, varrer_grade
+from diagnostico import Diagnostico, ativo_por_ambiente, importar, tabela_importacoes
+from exportacao import FORMATOS as FORMATOS_EXPORTACAO, ArquivosTemporarios, exportar, leitor_arquivo
+from graficos import (
+    grafico_barras,
+    grafico_equilibrio,
+    grafico_histograma,
+    grafico_mapa_calor,
+    grafico_pizza,
+    grafico_transicao,
+    graficos_itens,
+)
+from pipeline_xml import ler_em_segundo_plano
+from servico_calculo import servico_do_ambiente
+from tabela_ncm import carregar_tabela
+from visualizacao import paginar
+from transicao import projetar_itens, projetar_total, tabela_anos
+
+tempo_importacoes = time.perf_counter() - inicio_script
 
 # ===================== Configuração da Página =====================
 st.set_page_config(page_title="Entendendo a Reforma Tributária", layout="wide")
 
+
+@st.cache_resource
+def servico_calculo():
+    """Resultados compartilhados por todas as sessões deste processo."""
+    return servico_do_ambiente()
+
+
+@st.cache_resource
+def carregar_texto(nome):
+    """Texto estático do repositório, lido uma vez por processo (None se ausente)."""
+    caminho = os.path.join(os.path.dirname(os.path.abspath(__file__)), nome)
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
 # ===================== Cabeçalho =====================
 st.title("📊 Entendendo a Reforma Tributária")
 st.markdown("""
@@ -47,6 +105,10 @@ with st.expander("🔎 Leia sobre a Base de Cálculo do IBS/CBS e do Imposto Sel
     **Base de cálculo PIS/COFINS:**  
     (Valor Total do Item - ICMS) x Alíquota PIS/COFINS.
     """)
+    texto_base_calculo = carregar_texto("base_calculo_completa.txt")
+    if texto_base_calculo is not None:
+        st.markdown("**Texto legal completo:**")
+        st.markdown(texto_base_calculo)
 
 st.divider()
 
@@ -71,10 +133,23 @@ st.markdown("""
 st.divider()
 
 # ===================== Variáveis globais =====================
+THREADS_LEITURA_XML = 4
+TAMANHO_CACHE_GRAFICOS = 8
+
 comparativo_simulacao = None
 df_resumo_xml = None
 df_xml = None
 
+# ===================== Diagnóstico =====================
+# Medição opcional de cada etapa (tempo, itens, pico de memória), ligada
+# pela barra lateral; o painel fica no fim. Rastreamento de memória e log
+# são do servidor (REFORMA_DIAGNOSTICO e REFORMA_DIAGNOSTICO_LOG).
+with st.sidebar:
+    st.markdown("### 🩺 Diagnóstico")
+    diagnostico_ativo = st.toggle("Medir etapas (tempo, itens, memória)", value=ativo_por_ambiente(), key="diagnostico_ativo")
+diagnostico = Diagnostico(ativo=diagnostico_ativo)
+diagnostico.registrar("Inicialização", "Importações do script", tempo_importacoes)
+
 # ===================== Abas =====================
 aba_simulacao, aba_xml, aba_export = st.tabs(["🧮 Simulação Reforma Tributária", "📂 Importar XML de NF-e", "📥 Exportações"])
 
@@ -103,57 +178,159 @@ with aba_simulacao:
     outros = st.number_input("Outros custos aduaneiros (AFRMM, Cide, etc) (R$)", min_value=0.0, step=0.01, key="outros_sim")
 
     if st.button("Calcular Tributos", key="btn_simulacao"):
-        valor_aduaneiro = valor_fob + frete + seguro + outros
-        valor_ii = valor_aduaneiro * (ii / 100)
-        valor_is = valor_aduaneiro * (isel / 100)
-
-        base_ibs_cbs = valor_aduaneiro + valor_ii + valor_is + outros
-        valor_ibs = base_ibs_cbs * (ibs / 100)
-        valor_cbs = base_ibs_cbs * (cbs / 100)
-        valor_ipi = valor_aduaneiro * (ipi / 100)
-
-        base_icms = (valor_aduaneiro + valor_ii + valor_is + valor_ibs + valor_cbs + outros) / (1 - icms / 100)
-        valor_icms = base_icms * (icms / 100)
-
-        valor_pis = valor_aduaneiro * (pis / 100)
-        valor_cofins = valor_aduaneiro * (cofins / 100)
-
-        comparativo_simulacao = pd.DataFrame({
-            "Tributo": ["II", "PIS", "COFINS", "IPI", "IS", "IBS", "CBS", "ICMS"],
-            "Valor Após Reforma (R$)": [valor_ii, valor_pis, valor_cofins, valor_ipi, valor_is, valor_ibs, valor_cbs, valor_icms],
-            "Valor Antes da Reforma (R$)": [valor_ii, valor_pis, valor_cofins, valor_ipi, 0.0, 0.0, 0.0, valor_aduaneiro * (icms / 100)]
-        })
-        comparativo_simulacao.loc[len(comparativo_simulacao)] = [
-            "TOTAL",
-            comparativo_simulacao["Valor Após Reforma (R$)"].sum(),
-            comparativo_simulacao["Valor Antes da Reforma (R$)"].sum()
-        ]
-
-        st.success(f"**Valor Aduaneiro:** R$ {valor_aduaneiro:,.2f}")
-        st.info(f"**Custo Total da Importação (com tributos):** R$ {valor_aduaneiro + valor_ii + valor_pis + valor_cofins + valor_ipi + valor_icms:,.2f}")
-        st.markdown("### **Comparativo: Reforma vs Situação Atual**")
-        st.dataframe(comparativo_simulacao.style.format("R$ {:,.2f}"), use_container_width=True)
-
-        # Gráficos
-        tributos_grafico = comparativo_simulacao[comparativo_simulacao["Tributo"] != "TOTAL"].melt("Tributo", var_name="Cenário", value_name="Valor")
-        st.markdown("### **Gráficos de Comparativo (Antes x Depois)**")
-        col_g1, col_g2 = st.columns(2)
-        with col_g1:
-            st.markdown("**Distribuição em Barras**")
-            bar_chart = alt.Chart(tributos_grafico).mark_bar().encode(x="Tributo:N", y="Valor:Q", color="Cenário:N")
-            st.altair_chart(bar_chart, use_container_width=True)
-        with col_g2:
-            st.markdown("**Distribuição em Pizza (Após Reforma)**")
-            pie_chart = alt.Chart(comparativo_simulacao[comparativo_simulacao["Tributo"] != "TOTAL"]).mark_arc(innerRadius=50).encode(
-                theta="Valor Após Reforma (R$):Q",
-                color="Tributo:N"
+        with diagnostico.etapa("Simulação", "Cálculo comparativo"):
+            operacao = OperacaoImportacao(valor_fob=valor_fob, frete=frete, seguro=seguro, outros=outros)
+            aliquotas_sim = Aliquotas(ii=ii, pis=pis, cofins=cofins, ipi=ipi, icms=icms, ibs=ibs, cbs=cbs, isel=isel)
+            comparativo_simulacao = calcular_comparativo(operacao, aliquotas_sim)
+
+        st.success(f"**Valor Aduaneiro:** R$ {operacao.valor_aduaneiro:,.2f}")
+        st.info(f"**Custo Total da Importação (com tributos):** R$ {custo_total_importacao(operacao, aliquotas_sim):,.2f}")
+        with diagnostico.etapa("Simulação", "Tabela e gráficos"):
+            st.markdown("### **Comparativo: Reforma vs Situação Atual**")
+            st.dataframe(comparativo_simulacao.style.format("R$ {:,.2f}", subset=[COLUNA_APOS, COLUNA_ANTES]), use_container_width=True)
+
+            # Gráficos
+            st.markdown("### **Gráficos de Comparativo (Antes x Depois)**")
+            col_g1, col_g2 = st.columns(2)
+            with col_g1:
+                st.markdown("**Distribuição em Barras**")
+                st.altair_chart(grafico_barras(comparativo_simulacao), use_container_width=True)
+            with col_g2:
+                st.markdown("**Distribuição em Pizza (Após Reforma)**")
+                st.altair_chart(grafico_pizza(comparativo_simulacao), use_container_width=True)
+
+    # ----- Transição ano a ano -----
+    with st.expander("📅 Transição Ano a Ano (2026–2033)"):
+        st.markdown("Aplica o cronograma de transição às alíquotas e valores informados acima: CBS/IBS entram gradualmente, PIS/COFINS são extintos em 2027, o ICMS é reduzido de 2029 a 2033 e o IPI é zerado a partir de 2027 (exceto na Zona Franca de Manaus).")
+        zfm_sim = st.checkbox("Produto da Zona Franca de Manaus (mantém IPI)", key="zfm_sim")
+        with diagnostico.etapa("Simulação", "Transição ano a ano"):
+            transicao_sim = projetar_total(
+                OperacaoImportacao(valor_fob=valor_fob, frete=frete, seguro=seguro).valor_aduaneiro,
+                Aliquotas(ii=ii, pis=pis, cofins=cofins, ipi=ipi, icms=icms, ibs=ibs, cbs=cbs, isel=isel),
+                zfm=zfm_sim,
+                outros=outros
             )
-            st.altair_chart(pie_chart, use_container_width=True)
+            st.dataframe(transicao_sim.style.format("R$ {:,.2f}"), use_container_width=True)
+        # O gráfico fica atrás da opção para a primeira renderização não carregar o altair.
+        if st.checkbox("Mostrar gráfico da transição", key="grafico_transicao_sim"):
+            st.altair_chart(grafico_transicao(transicao_sim), use_container_width=True)
+
+    # ----- Varredura de cenários -----
+    with st.expander("🔁 Varredura de Cenários (Sensibilidade)"):
+        st.markdown("Avalia de uma só vez todas as combinações das faixas de **IBS**, **CBS** e **ICMS** para um ou mais perfis de operação. As demais alíquotas são as informadas acima.")
+
+        faixas_varredura = {}
+        colv1, colv2, colv3 = st.columns(3)
+        for coluna, campo, rotulo, padrao in [(colv1, "ibs", "IBS", (0.0, 20.0)), (colv2, "cbs", "CBS", (0.0, 12.0)), (colv3, "icms", "ICMS", (4.0, 25.0))]:
+            with coluna:
+                inicio, fim = st.slider(f"Faixa {rotulo} (%)", min_value=0.0, max_value=100.0, value=padrao, step=0.25, key=f"faixa_{campo}")
+                passo = st.number_input(f"Passo {rotulo} (p.p.)", min_value=0.01, max_value=100.0, value=0.25, step=0.01, key=f"passo_{campo}")
+                faixas_varredura[campo] = faixa(inicio, fim, passo)
+
+        st.markdown("**Perfis da operação** (adicione linhas para comparar perfis de FOB/frete):")
+        perfis_varredura = st.data_editor(
+            pd.DataFrame({"Valor FOB (R$)": [valor_fob], "Frete (R$)": [frete], "Seguro (R$)": [seguro], "Outros (R$)": [outros]}),
+            num_rows="dynamic",
+            use_container_width=True,
+            key="perfis_varredura"
+        )
+
+        if st.button("Executar Varredura", key="btn_varredura"):
+            operacoes_varredura = [
+                OperacaoImportacao(valor_fob=fob_p, frete=frete_p, seguro=seguro_p, outros=outros_p)
+                for fob_p, frete_p, seguro_p, outros_p in perfis_varredura.fillna(0.0).itertuples(index=False)
+            ]
+            if operacoes_varredura:
+                aliquotas_fixas = Aliquotas(ii=ii, pis=pis, cofins=cofins, ipi=ipi, isel=isel)
+                # Grades acima de MAX_CENARIOS são recusadas antes de montadas.
+                try:
+                    with diagnostico.etapa("Simulação", "Varredura de cenários") as etapa_varredura:
+                        st.session_state["varredura"] = varrer_grade(operacoes_varredura, aliquotas_fixas, faixas_varredura)
+                        st.session_state["equilibrio"] = equilibrio_ibs_cbs(operacoes_varredura, aliquotas_fixas, {"icms": faixas_varredura["icms"]})
+                        etapa_varredura["itens"] = st.session_state["varredura"].quantidade
+                except ValueError as erro:
+                    st.error(str(erro))
+
+        # O resultado fica na sessão: trocar o corte exibido não refaz a varredura.
+        varredura = st.session_state.get("varredura")
+        if varredura is not None:
+            st.caption(f"{varredura.quantidade:,} cenários avaliados.")
+            eixo_icms = varredura.eixos["icms"]
+            colm1, colm2 = st.columns(2)
+            with colm1:
+                perfil_mapa = st.selectbox("Perfil", options=list(varredura.eixos["perfil"]), format_func=lambda i: f"Perfil {i + 1}", key="perfil_mapa")
+            with colm2:
+                icms_mapa = st.select_slider("ICMS (%)", options=list(range(len(eixo_icms))), format_func=lambda i: f"{eixo_icms[i]:.2f}", key="icms_mapa")
+
+            fixos_mapa = {"perfil": perfil_mapa, "icms": icms_mapa}
+            col_h1, col_h2 = st.columns(2)
+            with col_h1:
+                st.markdown("**Carga total após a reforma (R$)**")
+                st.altair_chart(grafico_mapa_calor(varredura.mapa_calor("ibs", "cbs", fixos_mapa, valor="apos")), use_container_width=True)
+            with col_h2:
+                st.markdown("**Diferença após − antes (R$)**")
+                st.altair_chart(grafico_mapa_calor(varredura.mapa_calor("ibs", "cbs", fixos_mapa, valor="delta"), divergente=True), use_container_width=True)
+
+            eixos_equilibrio, equilibrio = st.session_state["equilibrio"]
+            df_equilibrio = pd.DataFrame(
+                equilibrio.T,
+                index=pd.Index(eixos_equilibrio["icms"], name="ICMS (%)"),
+                columns=[f"Perfil {i + 1}" for i in eixos_equilibrio["perfil"]]
+            )
+            st.markdown("**Equilíbrio: alíquota IBS + CBS (%) em que a carga após a reforma iguala a atual**")
+            st.altair_chart(grafico_equilibrio(df_equilibrio), use_container_width=True)
+
+    # ----- Monte Carlo -----
+    with st.expander("🎲 Simulação de Monte Carlo (Incerteza das Alíquotas)"):
+        st.markdown("Sorteia as alíquotas de **IBS** e **CBS** das distribuições escolhidas e avalia o custo total da importação e a diferença antes/depois da reforma. As demais alíquotas e valores são os informados acima.")
+
+        tipos_mc = {"Triangular": "triangular", "Normal (truncada)": "normal", "Uniforme": "uniforme", "Fixa": "fixa"}
+        distribuicoes_mc = {}
+        colmc1, colmc2 = st.columns(2)
+        for coluna, campo, rotulo, padrao in [(colmc1, "ibs", "IBS", (14.0, 17.7, 20.0)), (colmc2, "cbs", "CBS", (7.0, 8.8, 10.0))]:
+            with coluna:
+                st.markdown(f"**{rotulo} (%)**")
+                tipo = tipos_mc[st.selectbox("Distribuição", list(tipos_mc), key=f"mc_tipo_{campo}")]
+                minimo = st.number_input("Mínimo", min_value=0.0, max_value=100.0, value=padrao[0], step=0.01, key=f"mc_min_{campo}")
+                moda = st.number_input("Moda / Média / Valor fixo", min_value=0.0, max_value=100.0, value=padrao[1], step=0.01, key=f"mc_moda_{campo}")
+                maximo = st.number_input("Máximo", min_value=0.0, max_value=100.0, value=padrao[2], step=0.01, key=f"mc_max_{campo}")
+                desvio = st.number_input("Desvio padrão (Normal)", min_value=0.0, max_value=100.0, value=1.0, step=0.01, key=f"mc_desvio_{campo}")
+                distribuicoes_mc[campo] = (tipo, minimo, moda, maximo, desvio)
+
+        colmc3, colmc4 = st.columns(2)
+        with colmc3:
+            n_mc = st.select_slider("Número de sorteios", options=[10_000, 100_000, 1_000_000], value=1_000_000, format_func=lambda n: f"{n:,}", key="mc_n")
+        with colmc4:
+            workers_mc = st.number_input("Processos", min_value=1, max_value=32, value=1, step=1, key="mc_workers")
+
+        if st.button("Executar Monte Carlo", key="btn_monte_carlo"):
+            try:
+                distribuicoes = {campo: Distribuicao(*params) for campo, params in distribuicoes_mc.items()}
+            except ValueError as erro:
+                st.error(str(erro))
+            else:
+                with diagnostico.etapa("Simulação", "Monte Carlo", itens=n_mc):
+                    st.session_state["monte_carlo"] = simular_monte_carlo(
+                        OperacaoImportacao(valor_fob=valor_fob, frete=frete, seguro=seguro, outros=outros),
+                        Aliquotas(ii=ii, pis=pis, cofins=cofins, ipi=ipi, icms=icms, isel=isel),
+                        distribuicoes,
+                        n=n_mc,
+                        workers=int(workers_mc)
+                    )
+
+        monte_carlo = st.session_state.get("monte_carlo")
+        if monte_carlo is not None:
+            st.dataframe(monte_carlo.percentis().style.format("R$ {:,.2f}"), use_container_width=True)
+            col_mc1, col_mc2 = st.columns(2)
+            for coluna, campo, titulo in [(col_mc1, "custo_total", "Custo Total (R$)"), (col_mc2, "delta", "Diferença Após − Antes (R$)")]:
+                with coluna:
+                    st.markdown(f"**{titulo}**")
+                    st.altair_chart(grafico_histograma(monte_carlo.histograma(campo), titulo), use_container_width=True)
 
 # ===================== Aba 2: Importação de XML =====================
 with aba_xml:
     st.subheader("📂 Importar XML de NF-e")
-    st.markdown("Preencha as alíquotas para recalcular os tributos com base nos dados do XML.")
+    st.markdown("Preencha as alíquotas para recalcular os tributos com base nos dados do XML. Os valores de ICMS, PIS, COFINS, IPI e II informados em cada item da nota são usados no cenário atual, e as alíquotas de ICMS, PIS, COFINS e IPI do item valem também após a reforma; as alíquotas abaixo valem para os itens sem esses dados.")
 
     colx1, colx2, colx3 = st.columns(3)
     with colx1:
@@ -165,153 +342,364 @@ with aba_xml:
     with colx3:
         isel_xml = st.number_input("IS (%)", min_value=0.0, max_value=100.0, step=0.01, key="isel_xml")
 
+    # Tabela opcional de alíquotas de IBS/CBS/IS por NCM; o índice é montado
+    # uma vez por conteúdo e reaproveitado nos reruns.
+    arquivo_ncm = st.file_uploader("Tabela de alíquotas por NCM (opcional, CSV ou Parquet):", type=["csv", "parquet"], key="ncm_uploader")
+    indice_ncm = None
+    chave_ncm = None
+    if arquivo_ncm is not None:
+        conteudo_ncm = arquivo_ncm.getvalue()
+        chave_ncm = hash_conteudo(conteudo_ncm)
+        tabela_ncm_sessao = st.session_state.get("indice_ncm")
+        if tabela_ncm_sessao is None or tabela_ncm_sessao[0] != chave_ncm:
+            try:
+                tabela_ncm_sessao = (chave_ncm, carregar_tabela(BytesIO(conteudo_ncm), arquivo_ncm.name))
+            except (ValueError, KeyError) as erro:
+                st.error(f"Não foi possível ler a tabela de NCM: {erro}")
+                tabela_ncm_sessao = None
+            st.session_state["indice_ncm"] = tabela_ncm_sessao
+        if tabela_ncm_sessao is not None:
+            indice_ncm = tabela_ncm_sessao[1]
+            st.caption(f"{len(indice_ncm):,} prefixos de NCM carregados; itens sem correspondência usam as alíquotas padrão.")
+
     uploaded_xmls = st.file_uploader("Envie um ou mais arquivos XML de NF-e:", type=["xml"], accept_multiple_files=True, key="xml_uploader")
-    data_xml = []
 
+    aliquotas_padrao_xml = Aliquotas(ii=ii, pis=pis_xml, cofins=cofins_xml, ipi=ipi_xml, icms=icms_xml, ibs=ibs, cbs=cbs, isel=isel_xml)
+
+    def calcular_documento(documento):
+        """df dos itens com as alíquotas padrão ou, se houver, as da tabela de NCM.
+
+        Devolve também as alíquotas efetivas de cada item (com II, ICMS, IPI,
+        PIS e COFINS da nota), usadas na projeção da transição.
+        """
+        aliquotas, regime = aliquotas_padrao_xml, None
+        if indice_ncm is not None:
+            aliquotas, regime = indice_ncm.aliquotas_por_item(documento["NCM"], aliquotas_padrao_xml)
+        df = calcular_itens_xml(documento["vProd"], aliquotas, documento)
+        if regime is not None:
+            df.insert(df.columns.get_loc("Valor do Produto"), "Regime NCM", regime)
+        return df, aliquotas_efetivas(documento["vProd"], aliquotas, documento)
+
+    # Subtotais por arquivo: só os arquivos novos são somados; arquivos
+    # removidos saem do total. Mudança de alíquota ou de tabela de NCM
+    # reinicia o agregador.
+    perfil_xml = (aliquotas_padrao_xml, chave_ncm)
+    agregador = st.session_state.get("agregador_xml")
+    if agregador is None or agregador.perfil != perfil_xml:
+        agregador = AgregadorResumo(perfil_xml)
+        st.session_state["agregador_xml"] = agregador
+
+    # Itens lidos de cada arquivo ficam no serviço compartilhado pelo hash do
+    # conteúdo: ao alterar apenas alíquotas, o rerun refaz só o cálculo, e
+    # outra sessão que envie o mesmo XML não o lê de novo.
+    servico = servico_calculo()
+
+    def itens_do_arquivo(chave, colunas):
+        """(df, alíquotas) do arquivo, calculado uma vez por (hash, perfil) no serviço.
+
+        A chave não depende da ordem nem dos demais arquivos da sessão: quem
+        envia o mesmo XML com o mesmo perfil reaproveita o cálculo, e um
+        arquivo a mais calcula só esse arquivo.
+        """
+        return servico.obter((("itens", chave), perfil_xml), lambda: calcular_documento(colunas))
+
+    chaves_xml = []
+    colunas_por_chave = {}
+    # Itens calculados de cada arquivo nesta execução: o cálculo feito para
+    # o resumo parcial é o mesmo usado na tabela final.
+    itens_por_chave = {}
+    a_ler = []
     for uploaded_file in uploaded_xmls:
-        tree = ET.parse(uploaded_file)
-        root = tree.getroot()
-        ns = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
-
-        for det in root.findall('.//nfe:det', ns):
-            prod = det.find('nfe:prod', ns)
-            vProd = float(prod.find('nfe:vProd', ns).text)
-
-            valor_ii_item = vProd * (ii / 100)
-            valor_is_item = vProd * (isel_xml / 100)
-            base_ibs_cbs_item = vProd + valor_ii_item + valor_is_item
-            valor_ibs_item = base_ibs_cbs_item * (ibs / 100)
-            valor_cbs_item = base_ibs_cbs_item * (cbs / 100)
-            base_icms_item = (vProd + valor_ii_item + valor_is_item + valor_ibs_item + valor_cbs_item) / (1 - icms_xml / 100)
-            valor_icms_item = base_icms_item * (icms_xml / 100)
-
-            base_pis_cofins_item = (vProd + vProd * (ipi_xml / 100)) - valor_icms_item
-            valor_pis_item = base_pis_cofins_item * (pis_xml / 100)
-            valor_cofins_item = base_pis_cofins_item * (cofins_xml / 100)
-
-            valor_icms_old_item = vProd * (icms_xml / 100)
-            valor_pis_old_item = vProd * (pis_xml / 100)
-            valor_cofins_old_item = vProd * (cofins_xml / 100)
-            valor_ipi_item = vProd * (ipi_xml / 100)
-            valor_total_item = vProd + valor_ipi_item
-
-            data_xml.append({
-                'Valor do Produto': round(vProd, 2),
-                'Valor II': round(valor_ii_item, 2),
-                'Valor IS': round(valor_is_item, 2),
-                'Valor IBS': round(valor_ibs_item, 2),
-                'Valor CBS': round(valor_cbs_item, 2),
-                'Valor ICMS (Após Reforma)': round(valor_icms_item, 2),
-                'Valor ICMS (Antes Reforma)': round(valor_icms_old_item, 2),
-                'Valor PIS (Após Reforma)': round(valor_pis_item, 2),
-                'Valor PIS (Antes Reforma)': round(valor_pis_old_item, 2),
-                'Valor COFINS (Após Reforma)': round(valor_cofins_item, 2),
-                'Valor COFINS (Antes Reforma)': round(valor_cofins_old_item, 2),
-                'Valor IPI': round(valor_ipi_item, 2),
-                'Valor Total do Item': round(valor_total_item, 2)
-            })
-
-    if data_xml:
-        df_xml = pd.DataFrame(data_xml)
-        st.dataframe(df_xml, use_container_width=True)
-
-        df_resumo_xml = pd.DataFrame({
-            "Tributo": ["II", "PIS", "COFINS", "IPI", "IS", "IBS", "CBS", "ICMS"],
-            "Valor Após Reforma (R$)": [
-                df_xml["Valor II"].sum(),
-                df_xml["Valor PIS (Após Reforma)"].sum(),
-                df_xml["Valor COFINS (Após Reforma)"].sum(),
-                df_xml["Valor IPI"].sum(),
-                df_xml["Valor IS"].sum(),
-                df_xml["Valor IBS"].sum(),
-                df_xml["Valor CBS"].sum(),
-                df_xml["Valor ICMS (Após Reforma)"].sum()
-            ],
-            "Valor Antes da Reforma (R$)": [
-                df_xml["Valor II"].sum(),
-                df_xml["Valor PIS (Antes Reforma)"].sum(),
-                df_xml["Valor COFINS (Antes Reforma)"].sum(),
-                df_xml["Valor IPI"].sum(),
-                0.0,
-                0.0,
-                0.0,
-                df_xml["Valor ICMS (Antes Reforma)"].sum()
-            ]
-        })
-        df_resumo_xml.loc[len(df_resumo_xml)] = [
-            "TOTAL",
-            df_resumo_xml["Valor Após Reforma (R$)"].sum(),
-            df_resumo_xml["Valor Antes da Reforma (R$)"].sum()
-        ]
+        conteudo = uploaded_file.getvalue()
+        chave = hash_conteudo(conteudo)
+        if chave in chaves_xml:
+            continue
+        chaves_xml.append(chave)
+        colunas = servico.consultar(("colunas", chave), tipo="colunas")
+        if colunas is None:
+            a_ler.append((chave, conteudo))
+        else:
+            colunas_por_chave[chave] = colunas
+
+    # Arquivos novos são lidos em threads; a tela mostra o progresso e o
+    # resumo parcial enquanto os demais ainda estão sendo processados.
+    if a_ler:
+        with diagnostico.etapa("XML", "Leitura e cálculo dos arquivos novos") as etapa_leitura:
+            barra_leitura = st.progress(0.0, text="Lendo XMLs...")
+            resumo_parcial = st.empty()
+            inicio_leitura = time.perf_counter()
+            itens_lidos = 0
+            ultima_atualizacao = 0.0
+            for lidos, (chave, colunas, erro) in enumerate(ler_em_segundo_plano(a_ler, workers=THREADS_LEITURA_XML, servico=servico), start=1):
+                if erro is not None:
+                    st.warning(f"Arquivo ignorado (XML inválido): {erro}")
+                    chaves_xml.remove(chave)
+                else:
+                    colunas_por_chave[chave] = colunas
+                    itens_por_chave[chave] = itens_do_arquivo(chave, colunas)
+                    agregador.adicionar(chave, itens_por_chave[chave][0])
+                    itens_lidos += len(colunas["vProd"])
+
+                decorrido = max(time.perf_counter() - inicio_leitura, 1e-9)
+                barra_leitura.progress(lidos / len(a_ler), text=f"Lendo XMLs: {lidos}/{len(a_ler)} arquivos, {itens_lidos:,} itens ({itens_lidos / decorrido:,.0f} itens/s)")
+                if decorrido - ultima_atualizacao >= 0.5 or lidos == len(a_ler):
+                    ultima_atualizacao = decorrido
+                    with resumo_parcial.container():
+                        st.caption(f"Resumo parcial dos {len(agregador)} arquivo(s) já calculados")
+                        st.dataframe(agregador.resumo().style.format("R$ {:,.2f}", subset=[COLUNA_APOS, COLUNA_ANTES]), use_container_width=True)
+            barra_leitura.empty()
+            resumo_parcial.empty()
+            st.caption(f"{len(a_ler)} arquivo(s) lidos em {decorrido:.2f} s ({itens_lidos / decorrido:,.0f} itens/s).")
+            etapa_leitura["itens"] = itens_lidos
+
+    colunas_xml = [colunas_por_chave[chave] for chave in chaves_xml]
+
+    # ----- Base local de itens (Parquet) -----
+    with st.expander("💾 Base Local de Itens (Parquet)"):
+        st.markdown("Grava os itens lidos em uma base particionada por **mês de emissão** e **CNPJ do emitente**, para reabrir análises sem reenviar os XMLs.")
+        # O diretório vem do servidor: o app grava e lê nele, então não é um
+        # caminho livre digitado por quem usa.
+        raiz_base = raiz_do_ambiente()
+        st.caption(f"Diretório da base: '{raiz_base}' (definido no servidor por {VARIAVEL_RAIZ}).")
+        if st.button("Salvar XMLs enviados na base", key="btn_salvar_base", disabled=not chaves_xml):
+            try:
+                for chave, colunas in zip(chaves_xml, colunas_xml):
+                    gravar_itens(raiz_base, chave, colunas)
+            except ERROS_BASE as erro:
+                st.error(f"Não foi possível gravar na base '{raiz_base}': {erro}")
+            else:
+                st.success(f"{len(chaves_xml)} arquivo(s) gravado(s) em '{raiz_base}'.")
+
+        particoes_base = None
+        if existe_base(raiz_base):
+            try:
+                particoes_base = particoes(raiz_base)
+            except ERROS_BASE as erro:
+                st.error(f"'{raiz_base}' não pôde ser aberto como base Parquet: {erro}")
+        if particoes_base is not None:
+            meses_base, cnpjs_base = particoes_base
+            colb1, colb2 = st.columns(2)
+            with colb1:
+                meses_sel = st.multiselect("Meses de emissão", meses_base, key="meses_base")
+            with colb2:
+                cnpjs_sel = st.multiselect("CNPJ do emitente", cnpjs_base, key="cnpjs_base")
+            colb3, colb4 = st.columns(2)
+            with colb3:
+                if st.button("Carregar itens da base", key="btn_carregar_base"):
+                    # A assinatura dos arquivos entra na chave: recarregar a
+                    # mesma seleção depois de gravar mais XMLs gera outra
+                    # chave, e os subtotais e gráficos antigos não são usados.
+                    try:
+                        chave_base = f"base:{raiz_base}:{','.join(meses_sel)}:{','.join(cnpjs_sel)}:{assinatura(raiz_base, meses_sel, cnpjs_sel)}"
+                        st.session_state["itens_base"] = (chave_base, ler_colunas_base(raiz_base, meses_sel, cnpjs_sel))
+                    except ERROS_BASE as erro:
+                        st.error(f"Não foi possível ler a base '{raiz_base}': {erro}")
+            with colb4:
+                if st.button("Retirar itens da base da análise", key="btn_retirar_base"):
+                    st.session_state.pop("itens_base", None)
+
+        itens_base = st.session_state.get("itens_base")
+        if itens_base is not None:
+            st.info(f"{len(itens_base[1]['vProd']):,} itens carregados da base incluídos na análise.")
+
+    if itens_base is not None:
+        chaves_xml.append(itens_base[0])
+        colunas_xml.append(itens_base[1])
+
+    if colunas_xml:
+        with diagnostico.etapa("XML", "Cálculo dos itens", itens=sum(len(colunas["vProd"]) for colunas in colunas_xml)):
+            for chave, colunas in zip(chaves_xml, colunas_xml):
+                if chave not in itens_por_chave:
+                    itens_por_chave[chave] = itens_do_arquivo(chave, colunas)
+            itens_xml = [itens_por_chave[chave] for chave in chaves_xml]
+            df_xml = pd.concat([df for df, _ in itens_xml], ignore_index=True)
+            aliquotas_xml = concatenar_aliquotas([aliquotas for _, aliquotas in itens_xml], [len(df) for df, _ in itens_xml])
+            vprod_xml = df_xml["Valor do Produto"].to_numpy()
+
+        with diagnostico.etapa("XML", "Agregação do resumo", itens=len(df_xml)):
+            agregador.manter_somente(chaves_xml)
+            for chave, (df, _) in zip(chaves_xml, itens_xml):
+                if chave not in agregador:
+                    agregador.adicionar(chave, df)
+
+            df_resumo_xml = agregador.resumo()
+
+        # Tabela de itens paginada: filtro, ordenação e totais no servidor,
+        # só a página visível vai para o navegador.
+        st.markdown("### **Itens das NF-e**")
+        colp1, colp2, colp3, colp4 = st.columns([3, 3, 2, 2])
+        with colp1:
+            filtro_itens = st.text_input("Filtrar por NCM, CFOP ou regime", key="filtro_itens")
+        with colp2:
+            ordenar_itens = st.selectbox("Ordenar por", ["(ordem do arquivo)"] + list(df_xml.columns), key="ordenar_itens")
+        with colp3:
+            ordem_itens = st.radio("Ordem", ["Crescente", "Decrescente"], horizontal=True, key="ordem_itens")
+        with colp4:
+            tamanho_pagina = st.selectbox("Itens por página", [50, 100, 250, 500], index=1, key="tamanho_pagina")
+
+        with diagnostico.etapa("XML", "Tabela de itens (filtro, página, renderização)", itens=len(df_xml)):
+            pagina_atual = st.session_state.get("pagina_itens", 1)
+            pagina_xml, linhas_filtradas, total_paginas, totais_filtrados = paginar(
+                df_xml,
+                pagina=pagina_atual,
+                tamanho_pagina=tamanho_pagina,
+                filtro=filtro_itens,
+                ordenar_por=None if ordenar_itens == "(ordem do arquivo)" else ordenar_itens,
+                ascendente=ordem_itens == "Crescente",
+                totais=agregador.totais() if len(agregador) == len(chaves_xml) else None
+            )
+            st.dataframe(pagina_xml, use_container_width=True)
+            colp5, colp6 = st.columns([1, 3])
+            with colp5:
+                st.number_input("Página", min_value=1, max_value=total_paginas, value=min(pagina_atual, total_paginas), step=1, key="pagina_itens")
+            with colp6:
+                st.caption(f"{linhas_filtradas:,} de {len(df_xml):,} itens · {total_paginas:,} página(s)")
+            st.dataframe(totais_filtrados.to_frame("Total").T.style.format("R$ {:,.2f}"), use_container_width=True)
 
         st.markdown("### **Comparativo XML: Reforma vs Situação Atual**")
-        st.dataframe(df_resumo_xml.style.format("R$ {:,.2f}"), use_container_width=True)
+        st.dataframe(df_resumo_xml.style.format("R$ {:,.2f}", subset=[COLUNA_APOS, COLUNA_ANTES]), use_container_width=True)
 
-        tributos_grafico_xml = df_resumo_xml[df_resumo_xml["Tributo"] != "TOTAL"].melt("Tributo", var_name="Cenário", value_name="Valor")
+        # Especificações dos gráficos em cache por (arquivos, alíquotas,
+        # tabela de NCM, agrupamento): reruns que não mudam esses dados
+        # reaproveitam os gráficos sem reagregar os itens.
         st.markdown("### **Gráficos XML (Antes x Depois)**")
-        col_x1, col_x2 = st.columns(2)
-        with col_x1:
-            st.markdown("**Distribuição em Barras**")
-            bar_chart_xml = alt.Chart(tributos_grafico_xml).mark_bar().encode(
-                x="Tributo:N",
-                y="Valor:Q",
-                color="Cenário:N",
-                tooltip=["Tributo", "Cenário", "Valor"]
-            )
-            st.altair_chart(bar_chart_xml, use_container_width=True)
-        with col_x2:
-            st.markdown("**Distribuição em Pizza (Após Reforma)**")
-            pie_chart_xml = alt.Chart(df_resumo_xml[df_resumo_xml["Tributo"] != "TOTAL"]).mark_arc(innerRadius=50).encode(
-                theta="Valor Após Reforma (R$):Q",
-                color="Tributo:N",
-                tooltip=["Tributo", "Valor Após Reforma (R$)"]
-            )
-            st.altair_chart(pie_chart_xml, use_container_width=True)
+        if "cache_graficos" not in st.session_state:
+            st.session_state["cache_graficos"] = CacheLRU(max_itens=TAMANHO_CACHE_GRAFICOS)
+        cache_graficos = st.session_state["cache_graficos"]
+        digitos_ncm = st.radio(
+            "Agrupar NCM por",
+            options=[2, 4, 8],
+            index=2,
+            format_func={2: "Capítulo (2 dígitos)", 4: "Posição (4 dígitos)", 8: "NCM completo"}.get,
+            horizontal=True,
+            key="digitos_ncm"
+        )
+        with diagnostico.etapa("XML", "Gráficos", itens=len(df_xml)):
+            chave_graficos = (tuple(chaves_xml), perfil_xml, digitos_ncm)
+            graficos_xml = cache_graficos.get(chave_graficos)
+            if graficos_xml is None:
+                graficos_xml = {
+                    "barras": grafico_barras(df_resumo_xml),
+                    "pizza": grafico_pizza(df_resumo_xml),
+                    **graficos_itens(df_xml, digitos_ncm),
+                }
+                cache_graficos.put(chave_graficos, graficos_xml)
+
+            col_x1, col_x2 = st.columns(2)
+            with col_x1:
+                st.markdown("**Distribuição em Barras**")
+                st.altair_chart(graficos_xml["barras"], use_container_width=True)
+            with col_x2:
+                st.markdown("**Distribuição em Pizza (Após Reforma)**")
+                st.altair_chart(graficos_xml["pizza"], use_container_width=True)
+
+            col_x3, col_x4 = st.columns(2)
+            with col_x3:
+                st.markdown("**Diferença de Tributos por Item (Após − Antes)**")
+                st.altair_chart(graficos_xml["histograma"], use_container_width=True)
+            with col_x4:
+                st.markdown("**Tributos por NCM (maiores grupos)**")
+                st.altair_chart(graficos_xml["ncm"], use_container_width=True)
+            st.markdown("**Valor do Produto x Diferença de Tributos**")
+            st.altair_chart(graficos_xml["dispersao"], use_container_width=True)
+            if graficos_xml["pontos"] < len(df_xml):
+                st.caption(f"Dispersão reduzida a {graficos_xml['pontos']:,} de {len(df_xml):,} itens (extremos de cada faixa de valor preservados).")
+
+        st.markdown("### **Transição Ano a Ano (XML)**")
+        zfm_xml = st.checkbox("Produtos da Zona Franca de Manaus (mantém IPI)", key="zfm_xml")
+        with diagnostico.etapa("XML", "Transição ano a ano", itens=len(vprod_xml)):
+            transicao_xml = projetar_total(vprod_xml, aliquotas_xml, zfm=zfm_xml)
+            st.dataframe(transicao_xml.style.format("R$ {:,.2f}"), use_container_width=True)
+        if st.checkbox("Mostrar gráfico da transição", key="grafico_transicao_xml"):
+            st.altair_chart(grafico_transicao(transicao_xml), use_container_width=True)
+
+        item_transicao = st.number_input("Ver transição do item nº", min_value=1, max_value=len(vprod_xml), value=1, step=1, key="item_transicao")
+        st.dataframe(
+            tabela_anos(projetar_itens(vprod_xml[item_transicao - 1], aliquotas_xml.selecionar(item_transicao - 1), zfm=zfm_xml)[0]).style.format("R$ {:,.2f}"),
+            use_container_width=True
+        )
 
 # ===================== Aba 3: Exportações =====================
 with aba_export:
     st.subheader("📥 Exportação de Resultados")
-    st.markdown("Baixe os comparativos em **Excel** ou **PDF**.")
-    if st.button("Baixar Excel Consolidado", key="btn_excel"):
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            if comparativo_simulacao is not None:
-                comparativo_simulacao.to_excel(writer, sheet_name="Simulação", index=False)
-            if df_xml is not None:
-                df_xml.to_excel(writer, sheet_name="XML Detalhes", index=False)
-            if df_resumo_xml is not None:
-                df_resumo_xml.to_excel(writer, sheet_name="Resumo XML", index=False)
+    st.markdown("Baixe os comparativos em **Excel**, **CSV compactado**, **Parquet** ou **PDF**.")
+    # O arquivo é gravado em disco em blocos (Excel em modo constant_memory)
+    # e o botão de download só o lê quando é clicado, sem montar o relatório
+    # em memória a cada rerun. Os arquivos da sessão são apagados quando ela
+    # termina.
+    if "arquivos_temporarios" not in st.session_state:
+        st.session_state["arquivos_temporarios"] = ArquivosTemporarios()
+    arquivos_temporarios = st.session_state["arquivos_temporarios"]
+    formato_export = st.radio(
+        "Formato",
+        options=list(FORMATOS_EXPORTACAO),
+        format_func=lambda f: FORMATOS_EXPORTACAO[f][0],
+        horizontal=True,
+        key="formato_export"
+    )
+    if formato_export != "xlsx":
+        st.caption("CSV.gz e Parquet trazem só o detalhe dos itens do XML (a tabela maior); os resumos ficam no Excel.")
+    if st.button("Gerar arquivo para download", key="btn_excel"):
+        arquivos_temporarios.remover("exportacao")
+        st.session_state.pop("formato_exportado", None)
+        planilhas = {"Simulação": comparativo_simulacao, "XML Detalhes": df_xml, "Resumo XML": df_resumo_xml}
+        if formato_export != "xlsx" and df_xml is None:
+            st.warning("Nenhum XML carregado para exportar neste formato.")
+        else:
+            with st.spinner("Gravando arquivo..."), diagnostico.etapa("Exportação", f"Arquivo {formato_export}", itens=None if df_xml is None else len(df_xml)):
+                arquivos_temporarios.guardar("exportacao", exportar(formato_export, planilhas, principal="XML Detalhes"))
+            st.session_state["formato_exportado"] = formato_export
+
+    caminho_export = arquivos_temporarios.caminho("exportacao")
+    if caminho_export is not None:
+        formato_gerado = st.session_state["formato_exportado"]
         st.download_button(
-            label="Clique para baixar Excel",
-            data=output.getvalue(),
-            file_name="relatorio_tributos.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            label=f"Clique para baixar {FORMATOS_EXPORTACAO[formato_gerado][0]} ({os.path.getsize(caminho_export) / 2**20:,.1f} MiB)",
+            data=leitor_arquivo(caminho_export),
+            file_name=f"relatorio_tributos.{formato_gerado}",
+            mime=FORMATOS_EXPORTACAO[formato_gerado][1]
         )
 
-    if st.button("Baixar PDF Consolidado", key="btn_pdf"):
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", "B", 14)
-        pdf.cell(200, 10, txt="Relatório Comparativo de Tributos", ln=True, align="C")
-
-        if comparativo_simulacao is not None:
-            pdf.set_font("Arial", "B", 12)
-            pdf.cell(200, 10, txt="Simulação Manual", ln=True)
-            pdf.set_font("Arial", "", 10)
-            for _, row in comparativo_simulacao.iterrows():
-                pdf.cell(0, 10, txt=f"{row['Tributo']}: Após R$ {row['Valor Após Reforma (R$)']:.2f} | Antes R$ {row['Valor Antes da Reforma (R$)']:.2f}", ln=True)
-
-        if df_resumo_xml is not None:
-            pdf.set_font("Arial", "B", 12)
-            pdf.cell(200, 10, txt="Resumo XML", ln=True)
-            pdf.set_font("Arial", "", 10)
-            for _, row in df_resumo_xml.iterrows():
-                pdf.cell(0, 10, txt=f"{row['Tributo']}: Após R$ {row['Valor Após Reforma (R$)']:.2f} | Antes R$ {row['Valor Antes da Reforma (R$)']:.2f}", ln=True)
-
-        pdf_output = BytesIO()
-        pdf.output(pdf_output)
-        pdf_output.seek(0)
-
-        b64_pdf = base64.b64encode(pdf_output.read()).decode('utf-8')
-        href = f'<a href="data:application/pdf;base64,{b64_pdf}" download="relatorio_tributos.pdf">Clique aqui para baixar PDF</a>'
-        st.markdown(href, unsafe_allow_html=True)
+    if st.button("Gerar PDF Consolidado", key="btn_pdf"):
+        arquivos_temporarios.remover("pdf")
+        st.session_state.pop("tempos_pdf", None)
+        descritor_pdf, caminho_pdf = tempfile.mkstemp(suffix=".pdf", prefix="relatorio_tributos_")
+        os.close(descritor_pdf)
+        arquivos_temporarios.guardar("pdf", caminho_pdf)
+        with st.spinner("Gerando PDF..."), diagnostico.etapa("Exportação", "PDF", itens=None if df_xml is None else len(df_xml)):
+            st.session_state["tempos_pdf"] = importar("relatorio_pdf").gerar_relatorio(caminho_pdf, comparativo_simulacao, df_resumo_xml, df_xml)
+
+    caminho_pdf = arquivos_temporarios.caminho("pdf")
+    if caminho_pdf is not None and "tempos_pdf" in st.session_state:
+        st.download_button(
+            label=f"Clique para baixar PDF ({os.path.getsize(caminho_pdf) / 2**20:,.1f} MiB)",
+            data=leitor_arquivo(caminho_pdf),
+            file_name="relatorio_tributos.pdf",
+            mime="application/pdf"
+        )
+        st.caption("Tempo de geração por seção: " + " · ".join(f"{secao}: {segundos:.2f} s" for secao, segundos in st.session_state["tempos_pdf"].items()))
+
+# ===================== Painel de diagnóstico =====================
+if diagnostico.ativo:
+    with st.sidebar:
+        st.markdown("#### Etapas desta execução")
+        st.dataframe(diagnostico.tabela(), hide_index=True, use_container_width=True)
+        st.caption(f"Execução completa do script: {(time.perf_counter() - inicio_script) * 1000:,.0f} ms.")
+        estatisticas_servico = servico_calculo().estatisticas()
+        st.caption(
+            f"Cache compartilhado: {estatisticas_servico['entradas']} resultado(s), "
+            f"{estatisticas_servico['mib_em_uso']:,.1f} de {estatisticas_servico['mib_limite']:,.0f} MiB; "
+            f"{estatisticas_servico['acertos']} acerto(s) em memória, {estatisticas_servico['acertos_disco']} em disco, "
+            f"{estatisticas_servico['calculos']} cálculo(s), {estatisticas_servico['deduplicados']} pedido(s) deduplicado(s), "
+            f"{estatisticas_servico['descartes']} descarte(s)."
+        )
+        importacoes_sob_demanda = tabela_importacoes()
+        if not importacoes_sob_demanda.empty:
+            st.markdown("#### Importações sob demanda (neste processo)")
+            st.dataframe(importacoes_sob_demanda, hide_index=True, use_container_width=True)
+        if diagnostico.memoria:
+            st.caption("Pico de memória do processo: inclui o que outras sessões alocaram durante cada etapa. Com o tracemalloc ligado no servidor, os tempos ficam um pouco maiores que o normal.")
+        else:
+            st.caption("Pico de memória indisponível: o rastreamento de memória é ligado no servidor com REFORMA_DIAGNOSTICO=1.")
+        if diagnostico.caminho_log is not None:
+            st.caption(f"Etapas de todas as sessões gravadas em {diagnostico.caminho_log}.")
@@ -0,0 +1,142 @@
+"""Base local (Parquet) dos itens lidos das NF-e.
+
+Os itens são gravados como um dataset Parquet particionado no estilo Hive por
+mês de emissão e CNPJ do emitente (mes_emissao=2025-03/cnpj_emitente=.../).
+A leitura seleciona só as colunas e partições pedidas (predicate pushdown) e
+usa memory map nos arquivos locais, sem precisar reler os XMLs.
+
+O diretório da base é definido no servidor (REFORMA_BASE_DIR), não por quem
+usa o app, já que o app grava e lê nele.
+"""
+import hashlib
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+from leitor_nfe import CAMPOS_ITEM, CAMPOS_TEXTO
+
+VARIAVEL_RAIZ = "REFORMA_BASE_DIR"
+RAIZ_PADRAO = "dados_nfe"
+
+# Erros ao abrir ou gravar a base: diretório que não é um dataset Parquet
+# (ArrowInvalid) ou sem permissão/inacessível (OSError).
+ERROS_BASE = (pa.ArrowInvalid, OSError)
+
+COLUNAS_PARTICAO = ["mes_emissao", "cnpj_emitente"]
+SEM_INFORMACAO = "desconhecido"
+
+ESQUEMA_PARTICAO = pa.schema([
+    ("mes_emissao", pa.string()),
+    ("cnpj_emitente", pa.string()),
+])
+
+
+def _mes_emissao(dh_emi):
+    # dhEmi vem como "2025-03-14T10:00:00-03:00" (dEmi, nas versões antigas, "2025-03-14").
+    return dh_emi[:7] if dh_emi and len(dh_emi) >= 7 else SEM_INFORMACAO
+
+
+def tabela_itens(chave, colunas):
+    """Tabela Arrow dos itens de um arquivo, com as colunas de partição."""
+    cabecalho = colunas.get("cabecalho", {})
+    quantidade = len(colunas["vProd"])
+    dados = {
+        "arquivo": pa.array([chave] * quantidade, pa.string()),
+        "item": pa.array(np.arange(1, quantidade + 1), pa.int32()),
+    }
+    for campo in CAMPOS_ITEM:
+        if campo in colunas:
+            tipo = pa.string() if campo in CAMPOS_TEXTO else pa.float64()
+            dados[campo] = pa.array(colunas[campo], tipo)
+    dados["mes_emissao"] = pa.array([_mes_emissao(cabecalho.get("dhEmi"))] * quantidade, pa.string())
+    dados["cnpj_emitente"] = pa.array([cabecalho.get("CNPJ") or SEM_INFORMACAO] * quantidade, pa.string())
+    return pa.table(dados)
+
+
+def gravar_itens(raiz, chave, colunas):
+    """Grava os itens de um arquivo na base.
+
+    O nome do arquivo Parquet deriva da chave (hash do XML), então gravar
+    o mesmo XML de novo sobrescreve a cópia anterior em vez de duplicá-la.
+    """
+    ds.write_dataset(
+        tabela_itens(chave, colunas),
+        raiz,
+        format="parquet",
+        partitioning=ds.partitioning(ESQUEMA_PARTICAO, flavor="hive"),
+        basename_template=f"{chave}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def abrir_base(raiz):
+    return ds.dataset(
+        raiz,
+        format="parquet",
+        partitioning=ds.partitioning(ESQUEMA_PARTICAO, flavor="hive"),
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def particoes(raiz):
+    """Meses e CNPJs presentes na base, lidos só dos caminhos das partições."""
+    meses, cnpjs = set(), set()
+    for fragmento in abrir_base(raiz).get_fragments():
+        valores = ds.get_partition_keys(fragmento.partition_expression)
+        meses.add(valores.get("mes_emissao"))
+        cnpjs.add(valores.get("cnpj_emitente"))
+    return sorted(meses - {None}), sorted(cnpjs - {None})
+
+
+def _filtro(meses=None, cnpjs=None):
+    filtro = None
+    if meses:
+        filtro = ds.field("mes_emissao").isin(list(meses))
+    if cnpjs:
+        filtro_cnpj = ds.field("cnpj_emitente").isin(list(cnpjs))
+        filtro = filtro_cnpj if filtro is None else filtro & filtro_cnpj
+    return filtro
+
+
+def ler_itens(raiz, colunas=None, meses=None, cnpjs=None):
+    """Lê os itens da base, filtrando partições por mês e CNPJ."""
+    tabela = abrir_base(raiz).to_table(columns=colunas, filter=_filtro(meses, cnpjs))
+    return tabela.to_pandas()
+
+
+def assinatura(raiz, meses=None, cnpjs=None):
+    """Impressão digital dos arquivos da seleção (caminho, tamanho, data de alteração).
+
+    Muda quando XMLs são gravados ou regravados nas partições selecionadas,
+    então serve de chave para resultados calculados a partir da leitura.
+    """
+    partes = []
+    for fragmento in abrir_base(raiz).get_fragments(filter=_filtro(meses, cnpjs)):
+        info = os.stat(fragmento.path)
+        partes.append(f"{fragmento.path}:{info.st_size}:{info.st_mtime_ns}")
+    return hashlib.sha256("\n".join(sorted(partes)).encode("utf-8")).hexdigest()
+
+
+def ler_colunas_base(raiz, meses=None, cnpjs=None):
+    """Itens da base no mesmo formato de leitor_nfe.ler_colunas."""
+    disponiveis = set(abrir_base(raiz).schema.names)
+    campos = [campo for campo in CAMPOS_ITEM if campo in disponiveis]
+    df = ler_itens(raiz, colunas=campos, meses=meses, cnpjs=cnpjs)
+    colunas = {}
+    for campo in campos:
+        coluna = df[campo].to_numpy(dtype=object if campo in CAMPOS_TEXTO else np.float64)
+        coluna.flags.writeable = False
+        colunas[campo] = coluna
+    colunas["cabecalho"] = {}
+    return colunas
+
+
+def raiz_do_ambiente():
+    return os.environ.get(VARIAVEL_RAIZ) or RAIZ_PADRAO
+
+
+def existe_base(raiz):
+    return os.path.isdir(raiz) and any(os.scandir(raiz))
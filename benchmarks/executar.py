@@ -0,0 +1,231 @@
+"""Benchmarks dos caminhos de leitura, cálculo, agregação e exportação.
+
+Cada caso roda com 1 mil, 100 mil e 1 milhão de itens (ou os tamanhos de
+--tamanhos), sobre NF-e sintéticas de ITENS_POR_ARQUIVO itens geradas por
+gerar_nfe. Os resultados vão para um JSON com o ambiente (versões, commit)
+e, com --comparar, são comparados com um resultado anterior. Antes de
+medir, verificar.py confere o resultado dos caminhos otimizados contra
+implementações diretas (--sem-verificar pula essa etapa).
+
+Exemplo:
+    python benchmarks/executar.py --saida benchmarks/resultados/atual.json
+    python benchmarks/executar.py --tamanhos 1000 100000 --casos leitura calculo \\
+        --comparar benchmarks/resultados/base.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from io import BytesIO
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import pyarrow  # noqa: E402
+
+from agregacao import AgregadorResumo  # noqa: E402
+from calculo_tributos import Aliquotas, calcular_itens_xml, resumo_itens  # noqa: E402
+from exportacao import exportar  # noqa: E402
+from gerar_nfe import gerar_nfe  # noqa: E402
+from leitor_nfe import concatenar_colunas, ler_colunas  # noqa: E402
+from pipeline_xml import ler_em_segundo_plano  # noqa: E402
+from relatorio_pdf import gerar_relatorio  # noqa: E402
+from verificar import verificar_tudo  # noqa: E402
+
+TAMANHOS = [1_000, 100_000, 1_000_000]
+ITENS_POR_ARQUIVO = 1_000
+# Arquivos distintos gerados; lotes maiores reutilizam o conteúdo em ciclo,
+# o que não altera o custo de parsing e evita manter 1 GB de XML em memória.
+ARQUIVOS_DISTINTOS = 20
+ALIQUOTAS = Aliquotas(ii=10, pis=2.1, cofins=9.65, ipi=5, icms=18, ibs=17.7, cbs=8.8, isel=1)
+
+
+class Lote:
+    """XMLs sintéticos com `itens` itens no total, e os dados derivados."""
+
+    def __init__(self, itens):
+        self.itens = itens
+        tamanhos = [ITENS_POR_ARQUIVO] * (itens // ITENS_POR_ARQUIVO)
+        if itens % ITENS_POR_ARQUIVO:
+            tamanhos.append(itens % ITENS_POR_ARQUIVO)
+        distintos = {}
+        self.arquivos = []
+        for i, tamanho in enumerate(tamanhos):
+            chave = (tamanho, i % ARQUIVOS_DISTINTOS)
+            if chave not in distintos:
+                distintos[chave] = gerar_nfe(tamanho, semente=chave[1])
+            self.arquivos.append((f"nfe_{i:06d}", distintos[chave]))
+        self._colunas = None
+        self._df = None
+
+    @property
+    def colunas(self):
+        if self._colunas is None:
+            self._colunas = [ler_colunas(BytesIO(conteudo)) for _, conteudo in self.arquivos]
+        return self._colunas
+
+    @property
+    def df(self):
+        if self._df is None:
+            documento = concatenar_colunas(self.colunas)
+            self._df = calcular_itens_xml(documento["vProd"], ALIQUOTAS, documento)
+        return self._df
+
+
+def caso_leitura(lote):
+    for _, conteudo in lote.arquivos:
+        ler_colunas(BytesIO(conteudo))
+
+
+def caso_leitura_threads(lote):
+    for _ in ler_em_segundo_plano(lote.arquivos, workers=4):
+        pass
+
+
+def caso_calculo(lote):
+    documento = concatenar_colunas(lote.colunas)
+    calcular_itens_xml(documento["vProd"], ALIQUOTAS, documento)
+
+
+def caso_agregacao(lote):
+    valores = lote.df
+    agregador = AgregadorResumo()
+    inicio = 0
+    for (chave, _), colunas in zip(lote.arquivos, lote.colunas):
+        fim = inicio + len(colunas["vProd"])
+        agregador.adicionar(chave, valores.iloc[inicio:fim])
+        inicio = fim
+    agregador.resumo()
+
+
+def _caso_exportacao(formato):
+    def caso(lote):
+        caminho = exportar(formato, {"XML Detalhes": lote.df}, principal="XML Detalhes")
+        os.remove(caminho)
+    return caso
+
+
+def caso_pdf(lote):
+    descritor, caminho = tempfile.mkstemp(suffix=".pdf")
+    os.close(descritor)
+    resumo = resumo_itens(lote.df)
+    try:
+        gerar_relatorio(caminho, resumo, resumo, lote.df)
+    finally:
+        os.remove(caminho)
+
+
+CASOS = {
+    "leitura": caso_leitura,
+    "leitura_threads": caso_leitura_threads,
+    "calculo": caso_calculo,
+    "agregacao": caso_agregacao,
+    "exportacao_xlsx": _caso_exportacao("xlsx"),
+    "exportacao_csv_gz": _caso_exportacao("csv.gz"),
+    "exportacao_parquet": _caso_exportacao("parquet"),
+    "pdf": caso_pdf,
+}
+
+
+def medir(caso, lote, repeticoes):
+    """Menor tempo (s) entre `repeticoes` execuções."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        caso(lote)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def ambiente():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "processadores": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "pyarrow": pyarrow.__version__,
+    }
+
+
+def executar(tamanhos, casos, repeticoes=1):
+    resultados = []
+    for itens in tamanhos:
+        lote = Lote(itens)
+        # Colunas lidas e itens calculados ficam prontos antes da medição,
+        # para que cada caso meça só o próprio caminho.
+        lote.df
+        for nome in casos:
+            segundos = medir(CASOS[nome], lote, repeticoes)
+            resultados.append({
+                "caso": nome,
+                "itens": itens,
+                "segundos": round(segundos, 6),
+                "itens_por_segundo": round(itens / segundos, 1) if segundos > 0 else None,
+            })
+            print(f"{nome:<20} {itens:>10,} itens  {segundos:10.3f} s  {itens / segundos:>14,.0f} itens/s", flush=True)
+    return {"ambiente": ambiente(), "resultados": resultados}
+
+
+def comparar(atual, base, tolerancia):
+    """Imprime a razão de tempos atual/base; devolve os casos que pioraram além da tolerância."""
+    anteriores = {(r["caso"], r["itens"]): r["segundos"] for r in base["resultados"]}
+    piores = []
+    print(f"\nComparação com {base['ambiente'].get('commit') or 'base'} (razão de tempo atual/base):")
+    for r in atual["resultados"]:
+        anterior = anteriores.get((r["caso"], r["itens"]))
+        if not anterior:
+            continue
+        razao = r["segundos"] / anterior
+        marcador = "  <-- regressão" if razao > 1 + tolerancia else ""
+        print(f"{r['caso']:<20} {r['itens']:>10,} itens  {razao:6.2f}x{marcador}")
+        if marcador:
+            piores.append(r)
+    return piores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de leitura, cálculo e exportação de NF-e.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS, help="Quantidades de itens.")
+    parser.add_argument("--casos", nargs="+", choices=list(CASOS), default=list(CASOS))
+    parser.add_argument("--repeticoes", type=int, default=1, help="Execuções por caso (vale a menor).")
+    parser.add_argument("--saida", help="Arquivo JSON de resultados.")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparação.")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Piora relativa aceita na comparação.")
+    parser.add_argument("--sem-verificar", action="store_true", help="Não confere a corretude antes de medir.")
+    args = parser.parse_args(argv)
+
+    if not args.sem_verificar:
+        verificar_tudo()
+    atual = executar(args.tamanhos, args.casos, args.repeticoes)
+    if args.saida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(atual, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if comparar(atual, base, args.tolerancia):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Gerador de NF-e sintéticas para os benchmarks.
+
+Gera XMLs no namespace http://www.portalfiscal.inf.br/nfe com a estrutura
+de uma nota de importação do leiaute 4.00: ide completo, emit com endereço,
+IE e CRT, dest estrangeiro, det/prod com a declaração de importação (DI e
+adição, exigidas pelo CFOP 3102), det/imposto com ICMS, IPI, II, PIS e
+COFINS, total/ICMSTot, transp, pag e o protocolo (protNFe). A chave de
+acesso tem o dígito verificador correto (cDV). Os valores são aleatórios
+mas coerentes entre si (vICMS = vBC × pICMS etc.) e reproduzíveis pela
+semente.
+
+Diferenças deliberadas em relação ao schema: a assinatura digital
+(ds:Signature) não é gerada, pois exigiria um certificado, e os digestos do
+protocolo são fictícios; notas com mais de 990 itens, usadas para simular
+arquivos grandes, passam do limite de nItem. O parser do app não lê esses
+campos.
+
+Exemplo:
+    python benchmarks/gerar_nfe.py saida/ --arquivos 100 --itens 500
+    python benchmarks/gerar_nfe.py saida/ --arquivos 10 --tamanho-mb 5
+"""
+import argparse
+import os
+
+import numpy as np
+
+NS_NFE = "http://www.portalfiscal.inf.br/nfe"
+
+# Tamanho aproximado de um <det> gerado, usado para converter o tamanho
+# pedido em quantidade de itens.
+BYTES_POR_ITEM = 1_270
+
+NCMS = np.array([
+    "85171231", "84713012", "30049099", "22030000", "10063021",
+    "87032310", "39269090", "90183119", "29362100", "61091000",
+])
+
+_ITEM = (
+    '<det nItem="{n}"><prod><cProd>{n:06d}</cProd><cEAN>SEM GTIN</cEAN>'
+    "<xProd>PRODUTO SINTETICO {n}</xProd><NCM>{ncm}</NCM><CFOP>3102</CFOP>"
+    "<uCom>UN</uCom><qCom>{q:.4f}</qCom><vUnCom>{vun:.10f}</vUnCom><vProd>{vprod:.2f}</vProd>"
+    "<cEANTrib>SEM GTIN</cEANTrib><uTrib>UN</uTrib><qTrib>{q:.4f}</qTrib><vUnTrib>{vun:.10f}</vUnTrib>"
+    "<indTot>1</indTot>"
+    "<DI><nDI>{ndi}</nDI><dDI>{mes}-10</dDI><xLocDesemb>SANTOS</xLocDesemb><UFDesemb>SP</UFDesemb>"
+    "<dDesemb>{mes}-12</dDesemb><tpViaTransp>1</tpViaTransp><vAFRMM>0.00</vAFRMM><tpIntermedio>1</tpIntermedio>"
+    "<cExportador>EXP001</cExportador><adi><nAdicao>1</nAdicao><nSeqAdic>{adicao}</nSeqAdic>"
+    "<cFabricante>FAB001</cFabricante></adi></DI></prod>"
+    "<imposto><ICMS><ICMS00><orig>1</orig><CST>00</CST><modBC>3</modBC>"
+    "<vBC>{vbc_icms:.2f}</vBC><pICMS>{picms:.2f}</pICMS><vICMS>{vicms:.2f}</vICMS></ICMS00></ICMS>"
+    "<IPI><cEnq>999</cEnq><IPITrib><CST>00</CST><vBC>{vbc_ipi:.2f}</vBC><pIPI>{pipi:.2f}</pIPI>"
+    "<vIPI>{vipi:.2f}</vIPI></IPITrib></IPI>"
+    "<II><vBC>{vprod:.2f}</vBC><vDespAdu>0.00</vDespAdu><vII>{vii:.2f}</vII><vIOF>0.00</vIOF></II>"
+    "<PIS><PISAliq><CST>01</CST><vBC>{vprod:.2f}</vBC><pPIS>2.10</pPIS><vPIS>{vpis:.2f}</vPIS></PISAliq></PIS>"
+    "<COFINS><COFINSAliq><CST>01</CST><vBC>{vprod:.2f}</vBC><pCOFINS>9.65</pCOFINS>"
+    "<vCOFINS>{vcofins:.2f}</vCOFINS></COFINSAliq></COFINS></imposto></det>"
+)
+
+
+def digito_verificador(chave):
+    """Dígito verificador (módulo 11, pesos 2 a 9) dos 43 primeiros dígitos da chave."""
+    soma = sum(int(digito) * (2 + i % 8) for i, digito in enumerate(reversed(chave)))
+    resto = soma % 11
+    return 0 if resto < 2 else 11 - resto
+
+
+def gerar_nfe(itens, semente=0, mes="2025-03", cnpj="12345678000195"):
+    """Conteúdo (bytes) de uma NF-e com `itens` itens."""
+    rng = np.random.default_rng(semente)
+    quantidade = rng.integers(1, 100, itens)
+    valor_unitario = rng.uniform(1, 2000, itens).round(2)
+    vprod = (quantidade * valor_unitario).round(2)
+    ncm = rng.choice(NCMS, itens)
+    picms = rng.choice([4.0, 12.0, 18.0], itens)
+    pipi = rng.choice([0.0, 5.0, 10.0, 15.0], itens)
+    vii = (vprod * 0.10).round(2)
+    vbc_ipi = (vprod + vii).round(2)
+    vipi = (vbc_ipi * pipi / 100).round(2)
+    vpis = (vprod * 0.021).round(2)
+    vcofins = (vprod * 0.0965).round(2)
+    vbc_icms = ((vprod + vii + vipi + vpis + vcofins) / (1 - picms / 100)).round(2)
+    vicms = (vbc_icms * picms / 100).round(2)
+    numero = semente % 10**9
+    codigo = numero % 10**8
+
+    dets = "".join(
+        _ITEM.format(
+            n=n + 1, adicao=n % 999 + 1, ndi=f"25{numero:08d}", mes=mes, ncm=ncm[n], q=quantidade[n], vun=valor_unitario[n], vprod=vprod[n],
+            vbc_icms=vbc_icms[n], picms=picms[n], vicms=vicms[n],
+            vbc_ipi=vbc_ipi[n], pipi=pipi[n], vipi=vipi[n],
+            vii=vii[n], vpis=vpis[n], vcofins=vcofins[n],
+        )
+        for n in range(itens)
+    )
+    zero = "0.00"
+    total = (
+        f"<total><ICMSTot><vBC>{vbc_icms.sum():.2f}</vBC><vICMS>{vicms.sum():.2f}</vICMS><vICMSDeson>{zero}</vICMSDeson>"
+        f"<vFCP>{zero}</vFCP><vBCST>{zero}</vBCST><vST>{zero}</vST><vFCPST>{zero}</vFCPST><vFCPSTRet>{zero}</vFCPSTRet>"
+        f"<vProd>{vprod.sum():.2f}</vProd><vFrete>{zero}</vFrete><vSeg>{zero}</vSeg><vDesc>{zero}</vDesc>"
+        f"<vII>{vii.sum():.2f}</vII><vIPI>{vipi.sum():.2f}</vIPI><vIPIDevol>{zero}</vIPIDevol>"
+        f"<vPIS>{vpis.sum():.2f}</vPIS><vCOFINS>{vcofins.sum():.2f}</vCOFINS><vOutro>{zero}</vOutro>"
+        f"<vNF>{(vprod + vii + vipi + vpis + vcofins + vicms).sum():.2f}</vNF></ICMSTot></total>"
+    )
+    # Chave de acesso: UF, AAMM, CNPJ, modelo, série, número, tpEmis, código, DV.
+    chave = f"35{mes[2:4]}{mes[5:7]}{cnpj}55001{numero:09d}1{codigo:08d}"
+    dv = digito_verificador(chave)
+    chave += str(dv)
+    xml = (
+        f'<?xml version="1.0" encoding="UTF-8"?><nfeProc xmlns="{NS_NFE}" versao="4.00">'
+        f'<NFe><infNFe Id="NFe{chave}" versao="4.00">'
+        f"<ide><cUF>35</cUF><cNF>{codigo:08d}</cNF><natOp>IMPORTACAO</natOp><mod>55</mod><serie>1</serie>"
+        f"<nNF>{numero}</nNF><dhEmi>{mes}-15T10:00:00-03:00</dhEmi><tpNF>0</tpNF><idDest>3</idDest>"
+        f"<cMunFG>3550308</cMunFG><tpImp>1</tpImp><tpEmis>1</tpEmis><cDV>{dv}</cDV><tpAmb>2</tpAmb>"
+        f"<finNFe>1</finNFe><indFinal>0</indFinal><indPres>9</indPres><procEmi>0</procEmi><verProc>gerar_nfe</verProc></ide>"
+        f"<emit><CNPJ>{cnpj}</CNPJ><xNome>IMPORTADORA SINTETICA LTDA</xNome>"
+        f"<enderEmit><xLgr>RUA SINTETICA</xLgr><nro>100</nro><xBairro>CENTRO</xBairro><cMun>3550308</cMun>"
+        f"<xMun>SAO PAULO</xMun><UF>SP</UF><CEP>01001000</CEP><cPais>1058</cPais><xPais>BRASIL</xPais></enderEmit>"
+        f"<IE>111111111111</IE><CRT>3</CRT></emit>"
+        f"<dest><idEstrangeiro>0</idEstrangeiro><xNome>EXPORTADOR SINTETICO</xNome>"
+        f"<enderDest><xLgr>SYNTHETIC STREET</xLgr><nro>1</nro><xBairro>EXTERIOR</xBairro><cMun>9999999</cMun>"
+        f"<xMun>EXTERIOR</xMun><UF>EX</UF><cPais>2496</cPais><xPais>ESTADOS UNIDOS</xPais></enderDest>"
+        f"<indIEDest>9</indIEDest></dest>"
+        f"{dets}{total}"
+        f"<transp><modFrete>9</modFrete></transp>"
+        f"<pag><detPag><tPag>90</tPag><vPag>{zero}</vPag></detPag></pag>"
+        f"</infNFe></NFe>"
+        f'<protNFe versao="4.00"><infProt><tpAmb>2</tpAmb><verAplic>gerar_nfe</verAplic><chNFe>{chave}</chNFe>'
+        f"<dhRecbto>{mes}-15T10:00:05-03:00</dhRecbto><nProt>1350000{numero:08d}</nProt>"
+        f"<digVal>AAAAAAAAAAAAAAAAAAAAAAAAAAA=</digVal><cStat>100</cStat><xMotivo>Autorizado o uso da NF-e</xMotivo>"
+        f"</infProt></protNFe></nfeProc>"
+    )
+    return xml.encode("utf-8")
+
+
+def itens_para_tamanho(tamanho_bytes):
+    """Quantidade de itens para uma nota de aproximadamente `tamanho_bytes`."""
+    return max(1, int(tamanho_bytes // BYTES_POR_ITEM))
+
+
+def gerar_lote(diretorio, arquivos, itens, semente=0):
+    """Grava `arquivos` NF-e de `itens` itens cada em `diretorio`; devolve os caminhos."""
+    os.makedirs(diretorio, exist_ok=True)
+    caminhos = []
+    for i in range(arquivos):
+        caminho = os.path.join(diretorio, f"nfe_{i:06d}.xml")
+        with open(caminho, "wb") as f:
+            f.write(gerar_nfe(itens, semente=semente + i, mes=f"2025-{i % 12 + 1:02d}"))
+        caminhos.append(caminho)
+    return caminhos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera NF-e sintéticas para benchmarks.")
+    parser.add_argument("saida", help="Diretório onde os XMLs serão gravados.")
+    parser.add_argument("--arquivos", type=int, default=10)
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument("--itens", type=int, default=100, help="Itens por arquivo.")
+    grupo.add_argument("--tamanho-mb", type=float, help="Tamanho aproximado de cada arquivo, em MB.")
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    itens = itens_para_tamanho(args.tamanho_mb * 2**20) if args.tamanho_mb else args.itens
+    caminhos = gerar_lote(args.saida, args.arquivos, itens, args.semente)
+    print(f"{len(caminhos)} arquivo(s) com {itens:,} itens gravados em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
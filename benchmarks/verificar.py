@@ -0,0 +1,171 @@
+"""Verificações de corretude dos caminhos medidos pelos benchmarks.
+
+Cada caminho otimizado é comparado com uma implementação direta (lenta,
+mas óbvia) sobre dados sintéticos: o parser de passo único contra find()
+por campo, o índice de prefixos de NCM contra uma busca linear, o
+equilíbrio IBS + CBS em forma fechada contra as fórmulas do simulador e a
+projeção da transição em lotes contra o cálculo item a item. executar.py
+roda estas verificações antes de medir; também podem ser rodadas sozinhas:
+
+    python benchmarks/verificar.py
+"""
+import os
+import sys
+import xml.etree.ElementTree as ET
+from dataclasses import replace
+from io import BytesIO
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from calculo_tributos import (  # noqa: E402
+    COLUNA_ANTES,
+    TRIBUTOS,
+    Aliquotas,
+    OperacaoImportacao,
+    aliquotas_efetivas,
+    calcular_antes_reforma,
+    calcular_apos_reforma,
+    calcular_itens_xml,
+    resumo_itens,
+)
+from cenarios import equilibrio_ibs_cbs  # noqa: E402
+from gerar_nfe import NS_NFE, gerar_nfe  # noqa: E402
+from leitor_nfe import CAMPOS_ITEM, CAMPOS_TEXTO, ler_colunas  # noqa: E402
+from tabela_ncm import IndiceNCM  # noqa: E402
+from transicao import projetar_itens, projetar_total  # noqa: E402
+
+NS = {"nfe": NS_NFE}
+
+# Item isento/não tributado (grupos presentes sem alíquota nem valor) e item
+# sem nenhum grupo de tributo.
+NFE_ISENTA = (
+    f'<nfeProc xmlns="{NS_NFE}"><NFe><infNFe>'
+    '<det nItem="1"><prod><NCM>85171231</NCM><vProd>100.00</vProd></prod><imposto>'
+    "<ICMS><ICMS40><orig>1</orig><CST>40</CST></ICMS40></ICMS>"
+    "<IPI><cEnq>999</cEnq><IPINT><CST>53</CST></IPINT></IPI>"
+    "<PIS><PISNT><CST>06</CST></PISNT></PIS><COFINS><COFINSNT><CST>06</CST></COFINSNT></COFINS>"
+    "</imposto></det>"
+    '<det nItem="2"><prod><NCM>85171231</NCM><vProd>100.00</vProd></prod></det>'
+    "</infNFe></NFe></nfeProc>"
+).encode()
+
+
+def verificar_leitor():
+    """ler_colunas (iterparse, passo único) contra ElementTree completo e find() por campo."""
+    conteudo = gerar_nfe(300, semente=11)
+    colunas = ler_colunas(BytesIO(conteudo))
+    raiz = ET.fromstring(conteudo)
+    dets = raiz.findall(".//nfe:det", NS)
+    for campo, (grupo, tag) in CAMPOS_ITEM.items():
+        caminho = f"nfe:prod/nfe:{tag}" if grupo == "prod" else f"nfe:imposto/nfe:{grupo}//nfe:{tag}"
+        elementos = [det.find(caminho, NS) for det in dets]
+        if campo in CAMPOS_TEXTO:
+            esperado = np.array([e.text if e is not None else "" for e in elementos], dtype=object)
+            np.testing.assert_array_equal(colunas[campo], esperado, err_msg=campo)
+        else:
+            # Grupo do tributo presente sem o campo: 0; grupo ausente: NaN.
+            grupos = [det.find(f"nfe:imposto/nfe:{grupo}", NS) for det in dets]
+            esperado = np.array([
+                float(e.text) if e is not None else (0.0 if g is not None else np.nan)
+                for e, g in zip(elementos, grupos)
+            ])
+            np.testing.assert_array_equal(colunas[campo], esperado, err_msg=campo)
+
+    isenta = ler_colunas(BytesIO(NFE_ISENTA))
+    for campo in ("pICMS", "vICMS", "pIPI", "vIPI", "pPIS", "vPIS", "pCOFINS", "vCOFINS"):
+        np.testing.assert_array_equal(isenta[campo], [0.0, np.nan], err_msg=campo)
+    np.testing.assert_array_equal(isenta["vII"], [np.nan, np.nan], err_msg="vII")
+
+    totais = raiz.find(".//nfe:ICMSTot", NS)
+    for campo in ("vProd", "vII", "vIPI", "vICMS", "vPIS", "vCOFINS"):
+        np.testing.assert_allclose(colunas[campo].sum(), float(totais.find(f"nfe:{campo}", NS).text), atol=0.005, err_msg=campo)
+    assert colunas["cabecalho"] == {
+        "dhEmi": raiz.find(".//nfe:ide/nfe:dhEmi", NS).text,
+        "CNPJ": raiz.find(".//nfe:emit/nfe:CNPJ", NS).text,
+    }, colunas["cabecalho"]
+
+
+def verificar_indice_ncm():
+    """Prefixo mais longo do IndiceNCM contra uma busca linear em todos os prefixos."""
+    rng = np.random.default_rng(12)
+    ncms = np.array([f"{n:08d}" for n in rng.integers(0, 10**8, 3_000)], dtype=object)
+    # Prefixos tirados dos próprios NCMs (para haver correspondências) e aleatórios.
+    prefixos = {ncm[:tamanho] for ncm, tamanho in zip(ncms[:400], rng.integers(1, 9, 400))}
+    prefixos |= {f"{n:02d}" for n in rng.integers(0, 100, 30)}
+    tabela = pd.DataFrame({"ncm": sorted(prefixos)})
+    tabela["ibs"] = np.arange(len(tabela), dtype=np.float64)
+    indice = IndiceNCM(tabela)
+
+    linha_por_prefixo = {prefixo: i for i, prefixo in enumerate(indice.tabela["ncm"])}
+    esperado = []
+    for ncm in ncms:
+        casam = [prefixo for prefixo in linha_por_prefixo if ncm.startswith(prefixo)]
+        esperado.append(linha_por_prefixo[max(casam, key=len)] if casam else -1)
+    np.testing.assert_array_equal(indice.resolver(ncms), esperado)
+
+
+def verificar_equilibrio():
+    """Com IBS = equilíbrio e CBS = 0, a carga após a reforma iguala a anterior."""
+    rng = np.random.default_rng(13)
+    operacoes = [OperacaoImportacao(*valores) for valores in rng.uniform(100, 100_000, (5, 4))]
+    icms = np.arange(0.0, 26.0, 2.0)
+    aliquotas = Aliquotas(ii=14, pis=2.1, cofins=9.65, ipi=8, isel=1)
+    _, equilibrio = equilibrio_ibs_cbs(operacoes, aliquotas, {"icms": icms})
+    for i, operacao in enumerate(operacoes):
+        for j, valor_icms in enumerate(icms):
+            alvo = replace(aliquotas, icms=valor_icms)
+            com_ibs = replace(alvo, ibs=equilibrio[i, j], cbs=0.0)
+            apos = calcular_apos_reforma(operacao.valor_aduaneiro, com_ibs, operacao.outros).total
+            antes = calcular_antes_reforma(operacao.valor_aduaneiro, alvo).total
+            np.testing.assert_allclose(apos, antes, rtol=1e-9, err_msg=f"perfil {i}, ICMS {valor_icms}")
+
+
+def verificar_transicao():
+    """Projeção em lotes contra item a item, e 2026 igual ao cenário atual das notas."""
+    rng = np.random.default_rng(14)
+    quantidade = 2_500
+    base = rng.uniform(10, 50_000, quantidade)
+    por_item = Aliquotas(
+        ii=rng.choice([0.0, 10.0, 14.0], quantidade), pis=2.1, cofins=9.65,
+        ipi=rng.choice([0.0, 5.0], quantidade), icms=rng.choice([4.0, 12.0, 18.0], quantidade),
+        ibs=rng.uniform(0, 20, quantidade), cbs=8.8, isel=rng.choice([0.0, 1.0], quantidade),
+    )
+    for zfm in (False, True):
+        em_lotes = projetar_total(base, por_item, zfm=zfm, tamanho_lote=700)
+        item_a_item = sum(projetar_itens(base[i], por_item.selecionar(i), zfm=zfm)[0] for i in range(quantidade))
+        np.testing.assert_allclose(em_lotes[TRIBUTOS].to_numpy(), item_a_item, rtol=1e-9)
+
+    # Alíquotas únicas: o atalho sobre a soma das bases contra a projeção por item.
+    unicas = Aliquotas(ii=10, pis=2.1, cofins=9.65, ipi=5, icms=18, ibs=17.7, cbs=8.8, isel=1)
+    por_item_unicas = replace(unicas, ii=np.full(quantidade, 10.0))
+    np.testing.assert_allclose(projetar_total(base, unicas).to_numpy(), projetar_total(base, por_item_unicas).to_numpy(), rtol=1e-9)
+
+    documento = ler_colunas(BytesIO(gerar_nfe(500, semente=15)))
+    aliquotas = Aliquotas(ii=10, ibs=17.7, cbs=8.8)
+    resumo = resumo_itens(calcular_itens_xml(documento["vProd"], aliquotas, documento)).set_index("Tributo")
+    ano_2026 = projetar_total(documento["vProd"], aliquotas_efetivas(documento["vProd"], aliquotas, documento)).loc[2026]
+    for tributo in ("II", "PIS", "COFINS", "IPI", "ICMS"):
+        np.testing.assert_allclose(ano_2026[tributo], resumo.loc[tributo, COLUNA_ANTES], atol=0.01 * len(documento["vProd"]), err_msg=tributo)
+
+
+VERIFICACOES = {
+    "leitor": verificar_leitor,
+    "indice_ncm": verificar_indice_ncm,
+    "equilibrio": verificar_equilibrio,
+    "transicao": verificar_transicao,
+}
+
+
+def verificar_tudo():
+    """Roda todas as verificações; AssertionError na primeira divergência."""
+    for nome, verificacao in VERIFICACOES.items():
+        verificacao()
+        print(f"verificação {nome:<12} ok", flush=True)
+
+
+if __name__ == "__main__":
+    verificar_tudo()
@@ -0,0 +1,33 @@
+import hashlib
+from collections import OrderedDict
+
+
+def hash_conteudo(conteudo):
+    """SHA-256 do conteúdo de um arquivo, usado como chave de cache."""
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+class CacheLRU:
+    """Cache de tamanho limitado que descarta a entrada usada há mais tempo."""
+
+    def __init__(self, max_itens):
+        self.max_itens = max_itens
+        self._dados = OrderedDict()
+
+    def __contains__(self, chave):
+        return chave in self._dados
+
+    def __len__(self):
+        return len(self._dados)
+
+    def get(self, chave, padrao=None):
+        if chave not in self._dados:
+            return padrao
+        self._dados.move_to_end(chave)
+        return self._dados[chave]
+
+    def put(self, chave, valor):
+        self._dados[chave] = valor
+        self._dados.move_to_end(chave)
+        while len(self._dados) > self.max_itens:
+            self._dados.popitem(last=False)
@@ -0,0 +1,321 @@
+"""Fórmulas dos tributos antes e após a Reforma Tributária do Consumo.
+
+Módulo independente da interface: não importa streamlit, altair nem fpdf, e
+pode ser usado pelo app, por linha de comando ou em processos de lote. As
+funções aceitam tanto valores escalares quanto arrays NumPy/Series.
+"""
+from dataclasses import dataclass, fields, replace
+
+import numpy as np
+import pandas as pd
+
+TRIBUTOS = ["II", "PIS", "COFINS", "IPI", "IS", "IBS", "CBS", "ICMS"]
+COLUNA_APOS = "Valor Após Reforma (R$)"
+COLUNA_ANTES = "Valor Antes da Reforma (R$)"
+
+COLUNAS_XML = [
+    "Valor do Produto",
+    "Valor II",
+    "Valor IS",
+    "Valor IBS",
+    "Valor CBS",
+    "Valor ICMS (Após Reforma)",
+    "Valor ICMS (Antes Reforma)",
+    "Valor PIS (Após Reforma)",
+    "Valor PIS (Antes Reforma)",
+    "Valor COFINS (Após Reforma)",
+    "Valor COFINS (Antes Reforma)",
+    "Valor IPI",
+    "Valor Total do Item",
+]
+
+# Coluna de df_xml usada para cada tributo do resumo, na ordem de TRIBUTOS.
+# None indica tributo que não existe no regime.
+COLUNAS_RESUMO_APOS = [
+    "Valor II",
+    "Valor PIS (Após Reforma)",
+    "Valor COFINS (Após Reforma)",
+    "Valor IPI",
+    "Valor IS",
+    "Valor IBS",
+    "Valor CBS",
+    "Valor ICMS (Após Reforma)",
+]
+COLUNAS_RESUMO_ANTES = [
+    "Valor II",
+    "Valor PIS (Antes Reforma)",
+    "Valor COFINS (Antes Reforma)",
+    "Valor IPI",
+    None,
+    None,
+    None,
+    "Valor ICMS (Antes Reforma)",
+]
+
+
+@dataclass(frozen=True)
+class Aliquotas:
+    """Alíquotas em percentual, como informadas na tela."""
+    ii: float = 0.0
+    pis: float = 0.0
+    cofins: float = 0.0
+    ipi: float = 0.0
+    icms: float = 0.0
+    ibs: float = 0.0
+    cbs: float = 0.0
+    isel: float = 0.0
+
+    def selecionar(self, indices):
+        """Alíquotas dos itens em `indices`, quando há campos por item (arrays)."""
+        return replace(self, **{
+            campo.name: getattr(self, campo.name)[indices]
+            for campo in fields(self)
+            if np.ndim(getattr(self, campo.name))
+        })
+
+
+def concatenar_aliquotas(lista_aliquotas, tamanhos):
+    """Junta as Aliquotas de lotes de itens com `tamanhos` itens cada.
+
+    Campos escalares e iguais em todos os lotes continuam escalares; os
+    demais viram um array por item.
+    """
+    campos = {}
+    for campo in fields(Aliquotas):
+        valores = [getattr(aliquotas, campo.name) for aliquotas in lista_aliquotas]
+        if all(np.ndim(valor) == 0 for valor in valores) and len(set(valores)) == 1:
+            campos[campo.name] = valores[0]
+        else:
+            campos[campo.name] = np.concatenate([np.broadcast_to(valor, tamanho) for valor, tamanho in zip(valores, tamanhos)])
+    return Aliquotas(**campos)
+
+
+@dataclass(frozen=True)
+class OperacaoImportacao:
+    valor_fob: float = 0.0
+    frete: float = 0.0
+    seguro: float = 0.0
+    outros: float = 0.0
+
+    @property
+    def valor_aduaneiro(self):
+        return self.valor_fob + self.frete + self.seguro
+
+
+@dataclass(frozen=True)
+class TributosAntes:
+    ii: float
+    pis: float
+    cofins: float
+    ipi: float
+    icms: float
+
+    @property
+    def total(self):
+        return self.ii + self.pis + self.cofins + self.ipi + self.icms
+
+    def valores(self):
+        """Valores na ordem de TRIBUTOS (IS, IBS e CBS não existem)."""
+        return [self.ii, self.pis, self.cofins, self.ipi, 0.0, 0.0, 0.0, self.icms]
+
+
+@dataclass(frozen=True)
+class TributosApos:
+    ii: float
+    pis: float
+    cofins: float
+    ipi: float
+    isel: float
+    ibs: float
+    cbs: float
+    icms: float
+
+    @property
+    def total(self):
+        return self.ii + self.pis + self.cofins + self.ipi + self.isel + self.ibs + self.cbs + self.icms
+
+    def valores(self):
+        """Valores na ordem de TRIBUTOS."""
+        return [self.ii, self.pis, self.cofins, self.ipi, self.isel, self.ibs, self.cbs, self.icms]
+
+
+def calcular_antes_reforma(base, aliquotas):
+    """Regime atual: todos os tributos calculados "por fora" sobre a base."""
+    return TributosAntes(
+        ii=base * (aliquotas.ii / 100),
+        pis=base * (aliquotas.pis / 100),
+        cofins=base * (aliquotas.cofins / 100),
+        ipi=base * (aliquotas.ipi / 100),
+        icms=base * (aliquotas.icms / 100),
+    )
+
+
+def calcular_apos_reforma(base, aliquotas, outros=0.0, valor_ii=None, valor_ipi=None):
+    """Regime da reforma.
+
+    Base IBS/CBS: base + II + IS + outros custos aduaneiros. ICMS calculado
+    "por dentro" sobre a base IBS/CBS acrescida de IBS e CBS. PIS/COFINS sobre
+    o valor total (base + IPI) menos o ICMS. `valor_ii` e `valor_ipi`, quando
+    informados (ex.: lidos da NF-e), substituem o cálculo pela alíquota.
+    """
+    if valor_ii is None:
+        valor_ii = base * (aliquotas.ii / 100)
+    valor_is = base * (aliquotas.isel / 100)
+    base_ibs_cbs = base + valor_ii + valor_is + outros
+    valor_ibs = base_ibs_cbs * (aliquotas.ibs / 100)
+    valor_cbs = base_ibs_cbs * (aliquotas.cbs / 100)
+    base_icms = (base_ibs_cbs + valor_ibs + valor_cbs) / (1 - aliquotas.icms / 100)
+    valor_icms = base_icms * (aliquotas.icms / 100)
+
+    if valor_ipi is None:
+        valor_ipi = base * (aliquotas.ipi / 100)
+    base_pis_cofins = base + valor_ipi - valor_icms
+
+    return TributosApos(
+        ii=valor_ii,
+        pis=base_pis_cofins * (aliquotas.pis / 100),
+        cofins=base_pis_cofins * (aliquotas.cofins / 100),
+        ipi=valor_ipi,
+        isel=valor_is,
+        ibs=valor_ibs,
+        cbs=valor_cbs,
+        icms=valor_icms,
+    )
+
+
+def custo_total_importacao(operacao, aliquotas):
+    """Valor aduaneiro + outros custos + todos os tributos após a reforma."""
+    apos = calcular_apos_reforma(operacao.valor_aduaneiro, aliquotas, operacao.outros)
+    return operacao.valor_aduaneiro + operacao.outros + apos.total
+
+
+def _tabela_comparativa(valores_apos, valores_antes):
+    return pd.DataFrame({
+        "Tributo": TRIBUTOS + ["TOTAL"],
+        COLUNA_APOS: list(valores_apos) + [sum(valores_apos)],
+        COLUNA_ANTES: list(valores_antes) + [sum(valores_antes)],
+    })
+
+
+def comparativo_simulacao(operacao, aliquotas):
+    """Tabela Tributo x (Após, Antes) da simulação de importação, com TOTAL."""
+    base = operacao.valor_aduaneiro
+    apos = calcular_apos_reforma(base, aliquotas, operacao.outros)
+    antes = calcular_antes_reforma(base, aliquotas)
+    return _tabela_comparativa(apos.valores(), antes.valores())
+
+
+def _do_documento(documento, campo, calculado):
+    """Valor informado na NF-e quando presente; senão, o calculado."""
+    if documento is None or campo not in documento:
+        return calculado
+    informado = np.asarray(documento[campo], dtype=np.float64)
+    return np.where(np.isnan(informado), calculado, informado)
+
+
+# Campo de Aliquotas -> (alíquota, valor) do tributo no item da NF-e; o II
+# não tem alíquota na nota.
+CAMPOS_DOCUMENTO = {
+    "ii": (None, "vII"),
+    "icms": ("pICMS", "vICMS"),
+    "ipi": ("pIPI", "vIPI"),
+    "pis": ("pPIS", "vPIS"),
+    "cofins": ("pCOFINS", "vCOFINS"),
+}
+
+
+def aliquotas_do_documento(documento, aliquotas):
+    """Aliquotas com a alíquota de ICMS, IPI, PIS e COFINS de cada item da nota.
+
+    Itens sem o grupo do tributo no XML (NaN) ficam com a de `aliquotas`; o
+    grupo presente sem alíquota (isento, não tributado) já vem como 0.
+    """
+    if documento is None:
+        return aliquotas
+    return replace(aliquotas, **{
+        campo: _do_documento(documento, aliquota, getattr(aliquotas, campo))
+        for campo, (aliquota, _) in CAMPOS_DOCUMENTO.items()
+        if aliquota in documento
+    })
+
+
+def aliquotas_efetivas(vprod, aliquotas, documento=None):
+    """Alíquotas por item que reproduzem, sobre vProd, os valores da nota.
+
+    II, ICMS, IPI, PIS e COFINS informados no item viram valor / vProd, para
+    projeções que aplicam a alíquota sobre o valor do produto (transição);
+    os demais itens usam a alíquota do item ou a de `aliquotas`.
+    """
+    aliquotas = aliquotas_do_documento(documento, aliquotas)
+    if documento is None:
+        return aliquotas
+    vprod = np.asarray(vprod, dtype=np.float64)
+    efetivas = {}
+    for campo, (_, valor) in CAMPOS_DOCUMENTO.items():
+        if valor not in documento:
+            continue
+        aliquota = getattr(aliquotas, campo)
+        informado = _do_documento(documento, valor, vprod * (aliquota / 100))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            efetivas[campo] = np.where(vprod > 0, informado / vprod * 100, aliquota)
+    return replace(aliquotas, **efetivas)
+
+
+def calcular_itens_xml(vprod, aliquotas, documento=None):
+    """Calcula todos os tributos dos itens de uma vez, sobre a coluna de vProd.
+
+    `documento` traz as colunas lidas da NF-e (leitor_nfe.CAMPOS_ITEM). Os
+    valores "Antes" de ICMS, PIS e COFINS, e o II e o IPI, vêm da nota quando
+    presentes no item (NaN = ausente). As alíquotas de ICMS, IPI, PIS e
+    COFINS do item valem nos dois regimes, e as de `aliquotas` ficam como
+    fallback para os itens sem elas, de modo que "Antes" e "Após" partem da
+    mesma alíquota. Com NCM/CFOP no documento, essas colunas abrem a tabela.
+    O arredondamento é feito uma única vez, sobre o DataFrame final.
+    """
+    vprod = np.asarray(vprod, dtype=np.float64)
+    aliquotas = aliquotas_do_documento(documento, aliquotas)
+    antes = calcular_antes_reforma(vprod, aliquotas)
+    valor_ii = _do_documento(documento, "vII", antes.ii)
+    valor_ipi = _do_documento(documento, "vIPI", antes.ipi)
+    apos = calcular_apos_reforma(vprod, aliquotas, valor_ii=valor_ii, valor_ipi=valor_ipi)
+
+    df = pd.DataFrame({
+        "Valor do Produto": vprod,
+        "Valor II": valor_ii,
+        "Valor IS": apos.isel,
+        "Valor IBS": apos.ibs,
+        "Valor CBS": apos.cbs,
+        "Valor ICMS (Após Reforma)": apos.icms,
+        "Valor ICMS (Antes Reforma)": _do_documento(documento, "vICMS", antes.icms),
+        "Valor PIS (Após Reforma)": apos.pis,
+        "Valor PIS (Antes Reforma)": _do_documento(documento, "vPIS", antes.pis),
+        "Valor COFINS (Após Reforma)": apos.cofins,
+        "Valor COFINS (Antes Reforma)": _do_documento(documento, "vCOFINS", antes.cofins),
+        "Valor IPI": valor_ipi,
+        "Valor Total do Item": vprod + valor_ipi,
+    }, columns=COLUNAS_XML).round(2)
+
+    if documento is not None:
+        for campo in ("CFOP", "NCM"):
+            if campo in documento:
+                df.insert(0, campo, documento[campo])
+    return df
+
+
+def resumo_itens(df_xml):
+    """Resumo por tributo (Após, Antes) dos itens calculados, com TOTAL."""
+    return resumo_de_totais(df_xml[COLUNAS_XML].sum())
+
+
+def totais_por_item(df_xml):
+    """Total de tributos de cada item antes e após a reforma (arrays)."""
+    antes = df_xml[[c for c in COLUNAS_RESUMO_ANTES if c is not None]].to_numpy().sum(axis=1)
+    apos = df_xml[COLUNAS_RESUMO_APOS].to_numpy().sum(axis=1)
+    return antes, apos
+
+
+def resumo_de_totais(somas):
+    """Resumo por tributo a partir das somas já calculadas das COLUNAS_XML."""
+    valores_apos = [float(somas[c]) for c in COLUNAS_RESUMO_APOS]
+    valores_antes = [float(somas[c]) if c is not None else 0.0 for c in COLUNAS_RESUMO_ANTES]
+    return _tabela_comparativa(valores_apos, valores_antes)
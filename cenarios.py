@@ -0,0 +1,308 @@
+"""Varredura de cenários e simulação de Monte Carlo do simulador de importação.
+
+Avalia grades inteiras de alíquotas (por exemplo IBS x CBS x ICMS) para
+vários perfis de operação de uma só vez, ou milhões de sorteios de
+alíquotas incertas, com arrays NumPy sobre as mesmas fórmulas de
+calculo_tributos.
+"""
+import math
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+
+import numpy as np
+import pandas as pd
+
+from calculo_tributos import calcular_antes_reforma, calcular_apos_reforma, custo_total_importacao
+
+# Limite de cenários (perfis x combinações) de uma varredura: cada array da
+# grade ocupa 8 bytes por cenário e o cálculo cria dezenas deles.
+MAX_CENARIOS = 2_000_000
+
+
+def faixa(inicio, fim, passo):
+    """Valores de `inicio` a `fim` (inclusive) com o passo informado."""
+    if passo <= 0:
+        raise ValueError("O passo da faixa deve ser positivo.")
+    quantidade = int(np.floor((fim - inicio) / passo + 1e-9)) + 1
+    return inicio + passo * np.arange(max(quantidade, 1))
+
+
+def _grade(operacoes, aliquotas, faixas):
+    """Monta arrays prontos para broadcast: eixo 0 = perfil, depois as faixas."""
+    eixos = {"perfil": np.arange(len(operacoes))}
+    eixos.update({nome: np.asarray(valores, dtype=np.float64) for nome, valores in faixas.items()})
+    dimensoes = len(eixos)
+
+    def no_eixo(valores, posicao):
+        forma = [1] * dimensoes
+        forma[posicao] = len(valores)
+        return np.asarray(valores, dtype=np.float64).reshape(forma)
+
+    valor_aduaneiro = no_eixo([op.valor_aduaneiro for op in operacoes], 0)
+    outros = no_eixo([op.outros for op in operacoes], 0)
+    variaveis = {nome: no_eixo(valores, i) for i, (nome, valores) in enumerate(eixos.items()) if nome != "perfil"}
+    return eixos, valor_aduaneiro, outros, replace(aliquotas, **variaveis)
+
+
+@dataclass
+class ResultadoVarredura:
+    eixos: dict
+    carga_apos: np.ndarray
+    carga_antes: np.ndarray
+
+    @property
+    def delta(self):
+        """Carga após a reforma menos carga antes (positivo = aumento)."""
+        return self.carga_apos - self.carga_antes
+
+    @property
+    def quantidade(self):
+        return self.carga_apos.size
+
+    def para_dataframe(self):
+        """Grade completa em formato longo, uma linha por cenário."""
+        indices = pd.MultiIndex.from_product(list(self.eixos.values()), names=list(self.eixos))
+        return pd.DataFrame({
+            "Carga Após Reforma (R$)": self.carga_apos.ravel(),
+            "Carga Antes da Reforma (R$)": self.carga_antes.ravel(),
+            "Diferença (R$)": self.delta.ravel(),
+        }, index=indices).reset_index()
+
+    def mapa_calor(self, eixo_x, eixo_y, fixos=None, valor="delta", max_celulas=5000):
+        """Corte 2D da grade para um mapa de calor.
+
+        `fixos` indica o índice usado nos demais eixos (padrão: o primeiro).
+        Se o corte passar de `max_celulas`, os eixos são amostrados em passos
+        regulares para manter o gráfico leve.
+        """
+        fixos = fixos or {}
+        dados = {"delta": self.delta, "apos": self.carga_apos, "antes": self.carga_antes}[valor]
+        nomes = list(self.eixos)
+        corte = tuple(slice(None) if nome in (eixo_x, eixo_y) else fixos.get(nome, 0) for nome in nomes)
+        matriz = dados[corte]
+        if nomes.index(eixo_x) < nomes.index(eixo_y):
+            matriz = matriz.T
+
+        valores_x = self.eixos[eixo_x]
+        valores_y = self.eixos[eixo_y]
+        passo = max(1, int(np.ceil(np.sqrt(matriz.size / max_celulas))))
+        matriz = matriz[::passo, ::passo]
+        valores_y = valores_y[::passo]
+        valores_x = valores_x[::passo]
+
+        xs, ys = np.meshgrid(valores_x, valores_y)
+        return pd.DataFrame({eixo_x: xs.ravel(), eixo_y: ys.ravel(), "Valor": matriz.ravel()})
+
+
+def quantidade_cenarios(operacoes, faixas):
+    """Tamanho da grade (perfis x valores de cada faixa), sem montá-la."""
+    return math.prod([len(operacoes), *(len(valores) for valores in faixas.values())])
+
+
+def varrer_grade(operacoes, aliquotas, faixas, max_cenarios=MAX_CENARIOS):
+    """Calcula a carga tributária antes e após a reforma para toda a grade.
+
+    `operacoes` é uma lista de OperacaoImportacao (perfis FOB/frete/...),
+    `aliquotas` traz os valores fixos e `faixas` mapeia o nome de um campo de
+    Aliquotas (ex.: "ibs") para o array de valores a varrer. Grades com mais
+    de `max_cenarios` cenários são recusadas com ValueError.
+    """
+    quantidade = quantidade_cenarios(operacoes, faixas)
+    if quantidade > max_cenarios:
+        raise ValueError(
+            f"A varredura teria {quantidade:,} cenários; o limite é {max_cenarios:,}. "
+            "Aumente os passos, estreite as faixas ou use menos perfis."
+        )
+    eixos, valor_aduaneiro, outros, aliquotas_grade = _grade(operacoes, aliquotas, faixas)
+    forma = tuple(len(valores) for valores in eixos.values())
+    apos = calcular_apos_reforma(valor_aduaneiro, aliquotas_grade, outros)
+    antes = calcular_antes_reforma(valor_aduaneiro, aliquotas_grade)
+    return ResultadoVarredura(
+        eixos=eixos,
+        carga_apos=np.broadcast_to(apos.total, forma),
+        carga_antes=np.broadcast_to(antes.total, forma),
+    )
+
+
+def equilibrio_ibs_cbs(operacoes, aliquotas, faixas=None):
+    """Alíquota combinada IBS + CBS (%) em que a carga após a reforma iguala a anterior.
+
+    A carga após a reforma é linear na soma IBS + CBS, então o ponto de
+    equilíbrio tem solução fechada para cada ponto da grade das demais
+    alíquotas (`faixas` não deve conter "ibs" nem "cbs"). Valores negativos
+    indicam que nem com IBS/CBS zerados a carga cai ao nível anterior.
+    """
+    faixas = faixas or {}
+    if {"ibs", "cbs"} & set(faixas):
+        raise ValueError("A faixa de equilíbrio é calculada sobre IBS + CBS; não varra esses campos.")
+    eixos, valor_aduaneiro, outros, a = _grade(operacoes, aliquotas, faixas)
+    forma = tuple(len(valores) for valores in eixos.values())
+
+    valor_ii = valor_aduaneiro * (a.ii / 100)
+    valor_is = valor_aduaneiro * (a.isel / 100)
+    valor_ipi = valor_aduaneiro * (a.ipi / 100)
+    base_ibs_cbs = valor_aduaneiro + valor_ii + valor_is + outros
+    fator_icms = (a.icms / 100) / (1 - a.icms / 100)
+    pis_cofins = (a.pis + a.cofins) / 100
+
+    fixo = valor_ii + valor_is + valor_ipi + base_ibs_cbs * fator_icms * (1 - pis_cofins) + (valor_aduaneiro + valor_ipi) * pis_cofins
+    inclinacao = base_ibs_cbs * (1 + fator_icms * (1 - pis_cofins))
+    carga_antes = calcular_antes_reforma(valor_aduaneiro, a).total
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        equilibrio = (carga_antes - fixo) / inclinacao * 100
+    return eixos, np.broadcast_to(equilibrio, forma)
+
+
+# ===================== Monte Carlo =====================
+TIPOS_DISTRIBUICAO = ("fixa", "uniforme", "triangular", "normal")
+
+# Coeficientes da aproximação racional de Acklam para a inversa da normal
+# padrão (erro relativo < 1.2e-9), usada no sorteio da normal truncada.
+_ACKLAM_A = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02, 1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00)
+_ACKLAM_B = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02, 6.680131188771972e+01, -1.328068155288572e+01, 1.0)
+_ACKLAM_C = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00, -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00)
+_ACKLAM_D = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00, 3.754408661907416e+00, 1.0)
+_ACKLAM_CORTE = 0.02425
+
+
+def _normal_acumulada(z):
+    """Função de distribuição da normal padrão (precisa também na cauda inferior)."""
+    return 0.5 * math.erfc(-z / math.sqrt(2))
+
+
+def _normal_inversa(p):
+    """Inversa da função de distribuição da normal padrão, vetorizada."""
+    p = np.asarray(p, dtype=np.float64)
+    z = np.empty_like(p)
+    cauda = np.minimum(p, 1 - p)
+    centro = cauda >= _ACKLAM_CORTE
+
+    q = p[centro] - 0.5
+    r = q * q
+    z[centro] = q * np.polyval(_ACKLAM_A, r) / np.polyval(_ACKLAM_B, r)
+
+    q = np.sqrt(-2 * np.log(cauda[~centro]))
+    valores = np.polyval(_ACKLAM_C, q) / np.polyval(_ACKLAM_D, q)
+    z[~centro] = np.where(p[~centro] < 0.5, valores, -valores)
+    return z
+
+
+@dataclass(frozen=True)
+class Distribuicao:
+    """Distribuição de uma alíquota (%) para a simulação de Monte Carlo.
+
+    `moda` é o valor da distribuição fixa, a moda da triangular ou a média
+    da normal. A normal é truncada em [minimo, maximo]: os sorteios vêm da
+    normal condicionada ao intervalo (pela inversa da distribuição), sem
+    acumular probabilidade nos limites; a média pode ficar fora do intervalo.
+    """
+    tipo: str = "fixa"
+    minimo: float = 0.0
+    moda: float = 0.0
+    maximo: float = 0.0
+    desvio: float = 0.0
+
+    def __post_init__(self):
+        if self.tipo not in TIPOS_DISTRIBUICAO:
+            raise ValueError(f"Tipo de distribuição desconhecido: {self.tipo}")
+        if self.tipo != "fixa" and self.minimo > self.maximo:
+            raise ValueError("O mínimo da distribuição não pode ser maior que o máximo.")
+        if self.tipo == "triangular" and not self.minimo <= self.moda <= self.maximo:
+            raise ValueError("Na distribuição triangular, a moda deve estar entre o mínimo e o máximo.")
+
+    def amostrar(self, rng, n):
+        if self.tipo == "fixa":
+            return np.full(n, self.moda)
+        if self.tipo == "uniforme":
+            return rng.uniform(self.minimo, self.maximo, n)
+        if self.tipo == "triangular":
+            if self.minimo == self.maximo:
+                return np.full(n, self.minimo)
+            return rng.triangular(self.minimo, self.moda, self.maximo, n)
+        return self._normal_truncada(rng, n)
+
+    def _normal_truncada(self, rng, n):
+        if self.desvio <= 0 or self.minimo == self.maximo:
+            return np.full(n, np.clip(self.moda, self.minimo, self.maximo))
+        z_min = (self.minimo - self.moda) / self.desvio
+        z_max = (self.maximo - self.moda) / self.desvio
+        # Intervalo acima da média: sorteia o espelho na cauda inferior, onde
+        # a distribuição acumulada não perde precisão.
+        espelho = z_min > 0
+        if espelho:
+            z_min, z_max = -z_max, -z_min
+        p_min, p_max = _normal_acumulada(z_min), _normal_acumulada(z_max)
+        if p_max <= p_min:
+            # Faixa tão distante da média que a massa é desprezível.
+            return np.full(n, self.minimo if espelho else self.maximo)
+        z = np.clip(_normal_inversa(rng.uniform(p_min, p_max, n)), z_min, z_max)
+        return self.moda + self.desvio * (-z if espelho else z)
+
+
+@dataclass
+class ResultadoMonteCarlo:
+    custo_total: np.ndarray
+    delta: np.ndarray
+
+    def percentis(self, percentis=(5, 25, 50, 75, 95)):
+        return pd.DataFrame(
+            [np.percentile(self.custo_total, percentis), np.percentile(self.delta, percentis)],
+            index=["Custo Total (R$)", "Diferença Após − Antes (R$)"],
+            columns=[f"P{p}" for p in percentis],
+        )
+
+    def histograma(self, campo="custo_total", faixas=50):
+        """Histograma pré-agregado (uma linha por faixa), leve para gráficos."""
+        contagem, limites = np.histogram(getattr(self, campo), bins=faixas)
+        return pd.DataFrame({"Início": limites[:-1], "Fim": limites[1:], "Frequência": contagem})
+
+
+def _simular_lote(operacao, aliquotas, distribuicoes, semente, tamanho):
+    rng = np.random.default_rng(semente)
+    sorteios = {campo: dist.amostrar(rng, tamanho) for campo, dist in distribuicoes.items()}
+    aliquotas_lote = replace(aliquotas, **sorteios)
+    base = operacao.valor_aduaneiro
+    custo = custo_total_importacao(operacao, aliquotas_lote)
+    delta = calcular_apos_reforma(base, aliquotas_lote, operacao.outros).total - calcular_antes_reforma(base, aliquotas_lote).total
+    return (
+        np.broadcast_to(custo, tamanho).astype(np.float64),
+        np.broadcast_to(delta, tamanho).astype(np.float64),
+    )
+
+
+def _simular_lote_args(args):
+    return _simular_lote(*args)
+
+
+def simular_monte_carlo(operacao, aliquotas, distribuicoes, n=1_000_000, tamanho_lote=100_000, semente=None, workers=1):
+    """Sorteia as alíquotas de `distribuicoes` (campo de Aliquotas -> Distribuicao)
+    e avalia o custo total da importação e a diferença após − antes.
+
+    Os sorteios são feitos em lotes de `tamanho_lote`, então a memória
+    intermediária é limitada ao lote. Os resultados ficam em float64: em
+    float32 valores acima de ~R$ 131 mil não guardam os centavos.
+    Cada lote tem sua própria semente derivada de `semente`, de modo que o
+    resultado não depende de `workers` (processos usados quando > 1).
+    """
+    tamanhos = [min(tamanho_lote, n - inicio) for inicio in range(0, n, tamanho_lote)]
+    sementes = np.random.SeedSequence(semente).spawn(len(tamanhos))
+    tarefas = [(operacao, aliquotas, distribuicoes, semente_lote, tamanho) for semente_lote, tamanho in zip(sementes, tamanhos)]
+
+    custo_total = np.empty(n, dtype=np.float64)
+    delta = np.empty(n, dtype=np.float64)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            resultados = executor.map(_simular_lote_args, tarefas)
+            _preencher(resultados, tamanhos, custo_total, delta)
+    else:
+        _preencher(map(_simular_lote_args, tarefas), tamanhos, custo_total, delta)
+    return ResultadoMonteCarlo(custo_total=custo_total, delta=delta)
+
+
+def _preencher(resultados, tamanhos, custo_total, delta):
+    inicio = 0
+    for (custo_lote, delta_lote), tamanho in zip(resultados, tamanhos):
+        custo_total[inicio:inicio + tamanho] = custo_lote
+        delta[inicio:inicio + tamanho] = delta_lote
+        inicio += tamanho
@@ -0,0 +1,171 @@
+"""Instrumentação opcional das etapas do app (tempo, itens, pico de memória).
+
+O painel de cada sessão é ligado pela opção na barra lateral (ligada por
+padrão com REFORMA_DIAGNOSTICO=1). Cada etapa é medida com
+`with diagnostico.etapa(...)`; sem painel nem log o bloco roda sem custo
+adicional.
+
+O rastreamento de memória (tracemalloc) e o log são do processo, não da
+sessão: o tracemalloc só é ligado com REFORMA_DIAGNOSTICO=1 e nunca é
+desligado por uma sessão, e com REFORMA_DIAGNOSTICO_LOG=<arquivo> todas as
+sessões gravam cada etapa como uma linha JSON nesse arquivo (logger
+"reforma_tributaria.diagnostico"). Como as sessões rodam em threads do mesmo
+processo, o pico de memória de uma etapa é o pico do processo inteiro
+enquanto ela durou, incluindo o que outras sessões alocaram no período.
+
+Módulos pesados usados só em parte das telas (altair, fpdf, xlsxwriter) são
+carregados com `importar`, que registra o custo da primeira importação no
+processo em IMPORTACOES.
+"""
+import importlib
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+VARIAVEL_ATIVO = "REFORMA_DIAGNOSTICO"
+VARIAVEL_LOG = "REFORMA_DIAGNOSTICO_LOG"
+
+logger = logging.getLogger("reforma_tributaria.diagnostico")
+
+# Segundos gastos na primeira importação de cada módulo carregado sob demanda.
+IMPORTACOES = {}
+
+
+def importar(nome):
+    """Importa o módulo `nome` na primeira vez em que é usado."""
+    modulo = sys.modules.get(nome)
+    if modulo is None:
+        inicio = time.perf_counter()
+        modulo = importlib.import_module(nome)
+        IMPORTACOES[nome] = time.perf_counter() - inicio
+    return modulo
+
+
+def tabela_importacoes():
+    return pd.DataFrame(
+        {"Módulo": list(IMPORTACOES), "Tempo (ms)": [round(s * 1000, 1) for s in IMPORTACOES.values()]}
+    )
+
+
+def ativo_por_ambiente():
+    return os.environ.get(VARIAVEL_ATIVO, "").strip().lower() in ("1", "true", "sim", "on")
+
+
+def _configurar_logger(caminho):
+    if logger.handlers:
+        return
+    handler = logging.FileHandler(caminho, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+# O pico do tracemalloc é um só para o processo. Toda leitura passa por
+# _coletar_pico, que repassa o pico desde a última leitura a todas as etapas
+# em andamento (de qualquer sessão) antes de reiniciá-lo; assim uma etapa
+# não apaga o pico que outra ainda vai ler.
+_trava_memoria = threading.Lock()
+_medicoes_memoria = {}
+
+
+def _coletar_pico():
+    atual, pico = tracemalloc.get_traced_memory()
+    for medicao in _medicoes_memoria.values():
+        medicao["pico"] = max(medicao["pico"], pico)
+    tracemalloc.reset_peak()
+    return atual
+
+
+def _iniciar_memoria():
+    with _trava_memoria:
+        atual = _coletar_pico()
+        medicao = {"memoria_inicial": atual, "pico": atual}
+        _medicoes_memoria[id(medicao)] = medicao
+    return medicao
+
+
+def _terminar_memoria(medicao):
+    """Pico do processo (bytes acima do início) durante a medição."""
+    with _trava_memoria:
+        _coletar_pico()
+        del _medicoes_memoria[id(medicao)]
+    return max(medicao["pico"] - medicao["memoria_inicial"], 0)
+
+
+class Diagnostico:
+    """Registro das etapas de uma execução do script.
+
+    `ativo` liga o painel da sessão; com REFORMA_DIAGNOSTICO_LOG definido as
+    etapas são medidas e gravadas no log mesmo com o painel desligado.
+    """
+
+    def __init__(self, ativo=False):
+        self.ativo = ativo
+        self.caminho_log = os.environ.get(VARIAVEL_LOG) or None
+        self.medir = ativo or self.caminho_log is not None
+        self.etapas = []
+        self._nivel = 0
+        if ativo_por_ambiente() and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.memoria = tracemalloc.is_tracing()
+        if self.caminho_log is not None:
+            _configurar_logger(self.caminho_log)
+
+    def _gravar_log(self, registro):
+        if self.caminho_log is not None:
+            campos = {chave: None if isinstance(valor, float) and math.isnan(valor) else valor for chave, valor in registro.items()}
+            logger.info(json.dumps({"momento": datetime.now().isoformat(timespec="milliseconds"), **campos}, ensure_ascii=False))
+
+    @contextmanager
+    def etapa(self, aba, nome, itens=None):
+        """Mede o bloco; o dict devolvido aceita `itens` definido dentro do bloco."""
+        registro = {"aba": aba, "etapa": nome, "itens": itens}
+        if not self.medir:
+            yield registro
+            return
+
+        registro["nivel"] = self._nivel
+        self._nivel += 1
+        self.etapas.append(registro)
+        medicao = _iniciar_memoria() if self.memoria else None
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            segundos = time.perf_counter() - inicio
+            self._nivel -= 1
+            pico = _terminar_memoria(medicao) / 2**20 if medicao is not None else float("nan")
+            registro.update(segundos=segundos, pico_memoria_mib=pico)
+            self._gravar_log(registro)
+
+    def registrar(self, aba, nome, segundos, itens=None):
+        """Registra uma medição feita fora de `etapa` (ex.: importações do script)."""
+        if self.medir:
+            registro = {"aba": aba, "etapa": nome, "itens": itens, "nivel": 0, "segundos": segundos, "pico_memoria_mib": float("nan")}
+            self.etapas.append(registro)
+            self._gravar_log(registro)
+
+    def tabela(self):
+        """Etapas registradas, na ordem em que começaram."""
+        if not self.etapas:
+            return pd.DataFrame(columns=["Aba", "Etapa", "Tempo (ms)", "Itens", "Itens/s", "Pico de memória do processo (MiB)"])
+        df = pd.DataFrame(self.etapas)
+        itens = pd.to_numeric(df["itens"], errors="coerce")
+        return pd.DataFrame({
+            "Aba": df["aba"],
+            "Etapa": ["  " * nivel + nome for nivel, nome in zip(df["nivel"], df["etapa"])],
+            "Tempo (ms)": (df["segundos"] * 1000).round(1),
+            "Itens": itens,
+            "Itens/s": (itens / df["segundos"]).round(0),
+            "Pico de memória do processo (MiB)": df["pico_memoria_mib"].round(2),
+        })
@@ -0,0 +1,147 @@
+"""Exportação dos resultados para arquivo (Excel, CSV compactado, Parquet).
+
+As tabelas são gravadas direto em disco, em blocos de linhas: o Excel usa o
+modo constant_memory do xlsxwriter (cada linha vai para o arquivo assim que
+é escrita), o CSV.gz é gravado em chunks e o Parquet em row groups. Assim a
+memória usada não cresce com o número de itens exportados. As bibliotecas
+de cada formato só são importadas quando o formato é usado.
+
+No app, o botão de download recebe `leitor_arquivo(caminho)`: o arquivo só
+é lido quando o usuário clica, e não a cada rerun. Os arquivos gerados por
+uma sessão ficam em ArquivosTemporarios e são apagados quando ela termina.
+"""
+import os
+import tempfile
+import weakref
+
+from pandas.api.types import is_numeric_dtype, is_object_dtype, is_string_dtype
+
+from diagnostico import importar
+
+TAMANHO_BLOCO = 10_000
+FORMATO_MOEDA = "R$ #,##0.00"
+
+FORMATOS = {
+    "xlsx": ("Excel (.xlsx)", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv.gz": ("CSV compactado (.csv.gz)", "application/gzip"),
+    "parquet": ("Parquet (.parquet)", "application/vnd.apache.parquet"),
+}
+
+
+def _linhas(df, tamanho_bloco):
+    """Linhas de `df` em blocos, com NaN trocado por None (célula vazia)."""
+    for inicio in range(0, len(df), tamanho_bloco):
+        bloco = df.iloc[inicio:inicio + tamanho_bloco].astype(object)
+        yield from bloco.where(bloco.notna(), None).to_numpy().tolist()
+
+
+def gravar_excel(caminho, planilhas, tamanho_bloco=TAMANHO_BLOCO):
+    """Grava {nome da planilha: DataFrame} em um .xlsx com memória constante.
+
+    Colunas numéricas recebem o formato de moeda; as linhas são escritas em
+    ordem, bloco a bloco, como o modo constant_memory exige.
+    """
+    xlsxwriter = importar("xlsxwriter")
+    with xlsxwriter.Workbook(caminho, {"constant_memory": True}) as livro:
+        negrito = livro.add_format({"bold": True})
+        moeda = livro.add_format({"num_format": FORMATO_MOEDA})
+        for nome, df in planilhas.items():
+            if df is None:
+                continue
+            planilha = livro.add_worksheet(nome[:31])
+            for j, coluna in enumerate(df.columns):
+                numerica = is_numeric_dtype(df[coluna])
+                planilha.set_column(j, j, max(12, min(len(str(coluna)) + 2, 40)), moeda if numerica else None)
+            planilha.write_row(0, 0, [str(coluna) for coluna in df.columns], negrito)
+            for i, linha in enumerate(_linhas(df, tamanho_bloco), start=1):
+                planilha.write_row(i, 0, linha)
+    return caminho
+
+
+def gravar_csv_gz(caminho, df, tamanho_bloco=TAMANHO_BLOCO):
+    df.to_csv(caminho, index=False, compression="gzip", chunksize=tamanho_bloco)
+    return caminho
+
+
+def gravar_parquet(caminho, df, tamanho_bloco=TAMANHO_BLOCO):
+    """Grava `df` em Parquet, um row group por bloco de linhas.
+
+    O esquema vem do primeiro bloco, com as colunas de texto fixadas como
+    string: inferidas de um bloco vazio ou só com valores ausentes, elas
+    virariam `null` e os blocos seguintes não seriam convertidos.
+    """
+    pa = importar("pyarrow")
+    pq = importar("pyarrow.parquet")
+    esquema = pa.Schema.from_pandas(df.iloc[:tamanho_bloco], preserve_index=False)
+    for i, campo in enumerate(esquema):
+        if is_object_dtype(df[campo.name]) or is_string_dtype(df[campo.name]):
+            esquema = esquema.set(i, pa.field(campo.name, pa.string()))
+    with pq.ParquetWriter(caminho, esquema) as escritor:
+        for inicio in range(0, len(df), tamanho_bloco):
+            bloco = df.iloc[inicio:inicio + tamanho_bloco]
+            escritor.write_table(pa.Table.from_pandas(bloco, schema=esquema, preserve_index=False))
+    return caminho
+
+
+def exportar(formato, planilhas, principal, diretorio=None):
+    """Grava as tabelas em um arquivo temporário no `formato` e devolve o caminho.
+
+    Excel recebe todas as `planilhas`; CSV.gz e Parquet, que têm uma tabela
+    só, recebem a planilha `principal`.
+    """
+    descritor, caminho = tempfile.mkstemp(suffix=f".{formato}", prefix="relatorio_tributos_", dir=diretorio)
+    os.close(descritor)
+    try:
+        if formato == "xlsx":
+            return gravar_excel(caminho, planilhas)
+        if formato == "csv.gz":
+            return gravar_csv_gz(caminho, planilhas[principal])
+        if formato == "parquet":
+            return gravar_parquet(caminho, planilhas[principal])
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+    except BaseException:
+        os.remove(caminho)
+        raise
+
+
+def leitor_arquivo(caminho):
+    """Função sem argumentos que devolve o conteúdo de `caminho` (download sob demanda)."""
+    def ler():
+        with open(caminho, "rb") as arquivo:
+            return arquivo.read()
+    return ler
+
+
+def _apagar(caminhos):
+    for caminho in caminhos.values():
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+    caminhos.clear()
+
+
+class ArquivosTemporarios:
+    """Arquivos gerados por uma sessão, um por nome (ex.: "exportacao", "pdf").
+
+    Guardar outro arquivo com o mesmo nome apaga o anterior, e todos são
+    apagados quando o objeto é descartado (fim da sessão) ou o processo termina.
+    """
+
+    def __init__(self):
+        self._caminhos = {}
+        self._finalizador = weakref.finalize(self, _apagar, self._caminhos)
+
+    def guardar(self, nome, caminho):
+        self.remover(nome)
+        self._caminhos[nome] = caminho
+
+    def remover(self, nome):
+        caminho = self._caminhos.pop(nome, None)
+        if caminho is not None:
+            _apagar({nome: caminho})
+
+    def caminho(self, nome):
+        """Caminho do arquivo `nome`, se ele ainda existir."""
+        caminho = self._caminhos.get(nome)
+        return caminho if caminho is not None and os.path.exists(caminho) else None
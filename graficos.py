@@ -0,0 +1,177 @@
+"""Dados e especificações dos gráficos Altair.
+
+Os gráficos por item não enviam a tabela de itens ao navegador: os dados
+são agregados no servidor (faixas do histograma, soma por NCM, pontos
+reduzidos da dispersão), então o tamanho do JSON do Vega-Lite fica limitado
+por FAIXAS_HISTOGRAMA, MAX_BARRAS_NCM e MAX_PONTOS, qualquer que seja o
+número de itens.
+
+O altair é importado na primeira montagem de gráfico, não na importação
+deste módulo.
+"""
+import numpy as np
+import pandas as pd
+
+from calculo_tributos import COLUNA_ANTES, COLUNA_APOS, totais_por_item
+from diagnostico import importar
+
+FAIXAS_HISTOGRAMA = 40
+MAX_BARRAS_NCM = 20
+MAX_PONTOS = 2000
+OUTROS = "Outros"
+
+
+def _tributos(resumo):
+    return resumo[resumo["Tributo"] != "TOTAL"]
+
+
+def grafico_barras(resumo):
+    """Barras Antes x Depois por tributo a partir do resumo (Tributo, Após, Antes)."""
+    alt = importar("altair")
+    dados = _tributos(resumo).melt("Tributo", var_name="Cenário", value_name="Valor")
+    return alt.Chart(dados).mark_bar().encode(
+        x="Tributo:N",
+        y="Valor:Q",
+        color="Cenário:N",
+        tooltip=["Tributo", "Cenário", "Valor"]
+    )
+
+
+def grafico_pizza(resumo):
+    """Pizza dos tributos após a reforma."""
+    alt = importar("altair")
+    return alt.Chart(_tributos(resumo)).mark_arc(innerRadius=50).encode(
+        theta=f"{COLUNA_APOS}:Q",
+        color="Tributo:N",
+        tooltip=["Tributo", COLUNA_APOS]
+    )
+
+
+def grafico_transicao(tabela):
+    """Barras empilhadas por ano a partir de transicao.projetar_total."""
+    alt = importar("altair")
+    dados = tabela.drop(columns="TOTAL").reset_index().melt("Ano", var_name="Tributo", value_name="Valor")
+    return alt.Chart(dados).mark_bar().encode(
+        x="Ano:O",
+        y="Valor:Q",
+        color="Tributo:N",
+        tooltip=["Ano", "Tributo", "Valor"]
+    )
+
+
+def grafico_mapa_calor(dados, divergente=False):
+    """Mapa de calor IBS x CBS a partir de ResultadoVarredura.mapa_calor."""
+    alt = importar("altair")
+    escala = alt.Scale(scheme="redblue", reverse=True, domainMid=0) if divergente else alt.Undefined
+    return alt.Chart(dados).mark_rect().encode(
+        x=alt.X("ibs:O", title="IBS (%)"),
+        y=alt.Y("cbs:O", title="CBS (%)", sort="descending"),
+        color=alt.Color("Valor:Q", title="R$", scale=escala),
+        tooltip=["ibs", "cbs", "Valor"]
+    )
+
+
+def grafico_equilibrio(df_equilibrio):
+    """Linhas da alíquota IBS + CBS de equilíbrio por ICMS, uma por perfil."""
+    alt = importar("altair")
+    dados = df_equilibrio.reset_index().melt("ICMS (%)", var_name="Perfil", value_name="IBS + CBS (%)")
+    return alt.Chart(dados).mark_line().encode(
+        x="ICMS (%):Q",
+        y="IBS + CBS (%):Q",
+        color="Perfil:N",
+        tooltip=["Perfil", "ICMS (%)", "IBS + CBS (%)"]
+    )
+
+
+def grafico_histograma(dados, titulo):
+    """Histograma já agregado (Início, Fim, Frequência), ex.: do Monte Carlo."""
+    alt = importar("altair")
+    return alt.Chart(dados).mark_bar().encode(
+        x=alt.X("Início:Q", bin="binned", title=titulo),
+        x2="Fim:Q",
+        y="Frequência:Q",
+        tooltip=["Início", "Fim", "Frequência"]
+    )
+
+
+def histograma_delta(delta, faixas=FAIXAS_HISTOGRAMA):
+    """Quantidade de itens e soma da diferença (após − antes) por faixa."""
+    if len(delta) == 0:
+        return pd.DataFrame(columns=["Início", "Fim", "Itens", "Diferença (R$)"])
+    quantidade, bordas = np.histogram(delta, bins=faixas)
+    soma, _ = np.histogram(delta, bins=bordas, weights=delta)
+    return pd.DataFrame({
+        "Início": bordas[:-1],
+        "Fim": bordas[1:],
+        "Itens": quantidade,
+        "Diferença (R$)": soma,
+    }).round(2)
+
+
+def soma_por_ncm(ncms, antes, apos, digitos=8, max_barras=MAX_BARRAS_NCM):
+    """Totais antes/após agrupados pelos primeiros `digitos` do NCM.
+
+    Mantém os `max_barras` grupos de maior total após a reforma e soma o
+    restante em "Outros".
+    """
+    grupos = pd.Series(ncms, dtype=object).fillna("").astype(str).str[:digitos].replace("", "sem NCM")
+    somas = pd.DataFrame({COLUNA_APOS: apos, COLUNA_ANTES: antes}).groupby(grupos.to_numpy()).sum()
+    somas = somas.sort_values(COLUNA_APOS, ascending=False)
+    if len(somas) > max_barras:
+        restante = somas.iloc[max_barras:].sum().rename(OUTROS)
+        somas = pd.concat([somas.iloc[:max_barras], restante.to_frame().T])
+    return somas.rename_axis("NCM").reset_index().round(2)
+
+
+def reduzir_pontos(x, y, max_pontos=MAX_PONTOS):
+    """Índices de no máximo `max_pontos` pontos de (x, y) para a dispersão.
+
+    Os pontos são ordenados por x e divididos em max_pontos/2 blocos; de cada
+    bloco ficam o menor e o maior y, preservando os extremos visíveis.
+    """
+    if len(x) <= max_pontos:
+        return np.arange(len(x))
+    ordem = np.argsort(x, kind="stable")
+    blocos = np.array_split(ordem, max_pontos // 2)
+    escolhidos = []
+    for bloco in blocos:
+        valores = y[bloco]
+        escolhidos.append(bloco[np.argmin(valores)])
+        escolhidos.append(bloco[np.argmax(valores)])
+    return np.unique(escolhidos)
+
+
+def graficos_itens(df_xml, digitos_ncm=8):
+    """Gráficos por item: histograma da diferença, soma por NCM e dispersão."""
+    alt = importar("altair")
+    antes, apos = totais_por_item(df_xml)
+    delta = apos - antes
+
+    histograma = alt.Chart(histograma_delta(delta)).mark_bar().encode(
+        x=alt.X("Início:Q", bin="binned", title="Diferença por item (R$)"),
+        x2="Fim:Q",
+        y=alt.Y("Itens:Q"),
+        tooltip=["Início", "Fim", "Itens", "Diferença (R$)"]
+    )
+
+    por_ncm = soma_por_ncm(df_xml["NCM"], antes, apos, digitos=digitos_ncm)
+    barras_ncm = alt.Chart(por_ncm.melt("NCM", var_name="Cenário", value_name="Valor")).mark_bar().encode(
+        y=alt.Y("NCM:N", sort=list(por_ncm["NCM"])),
+        x="Valor:Q",
+        color="Cenário:N",
+        yOffset="Cenário:N",
+        tooltip=["NCM", "Cenário", "Valor"]
+    )
+
+    vprod = df_xml["Valor do Produto"].to_numpy()
+    indices = reduzir_pontos(vprod, delta)
+    dispersao = alt.Chart(pd.DataFrame({
+        "Valor do Produto": vprod[indices],
+        "Diferença (R$)": delta[indices].round(2),
+        "NCM": df_xml["NCM"].to_numpy()[indices],
+    })).mark_circle(size=30, opacity=0.6).encode(
+        x="Valor do Produto:Q",
+        y="Diferença (R$):Q",
+        tooltip=["NCM", "Valor do Produto", "Diferença (R$)"]
+    )
+    return {"histograma": histograma, "ncm": barras_ncm, "dispersao": dispersao, "pontos": len(indices)}
@@ -0,0 +1,148 @@
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+NS_NFE = "http://www.portalfiscal.inf.br/nfe"
+TAG_DET = f"{{{NS_NFE}}}det"
+TAG_IMPOSTO = f"{{{NS_NFE}}}imposto"
+
+# Campos do cabeçalho da nota: (tag do pai, tag) -> chave em `cabecalho`.
+CAMPOS_CABECALHO = {
+    (f"{{{NS_NFE}}}ide", f"{{{NS_NFE}}}dhEmi"): "dhEmi",
+    (f"{{{NS_NFE}}}ide", f"{{{NS_NFE}}}dEmi"): "dhEmi",
+    (f"{{{NS_NFE}}}emit", f"{{{NS_NFE}}}CNPJ"): "CNPJ",
+}
+
+# Campos lidos de cada item: coluna -> (grupo, tag). O grupo é "prod" ou o
+# grupo do tributo dentro de "imposto" (ICMS, IPI, PIS, COFINS, II); a tag é
+# procurada em qualquer nível abaixo do grupo (ex.: ICMS/ICMS00/pICMS). Só
+# entram campos usados no cálculo: cada campo a mais custa tempo de parsing
+# e espaço em cache e na base Parquet.
+CAMPOS_ITEM = {
+    "NCM": ("prod", "NCM"),
+    "CFOP": ("prod", "CFOP"),
+    "vProd": ("prod", "vProd"),
+    "vII": ("II", "vII"),
+    "pICMS": ("ICMS", "pICMS"),
+    "vICMS": ("ICMS", "vICMS"),
+    "pIPI": ("IPI", "pIPI"),
+    "vIPI": ("IPI", "vIPI"),
+    "pPIS": ("PIS", "pPIS"),
+    "vPIS": ("PIS", "vPIS"),
+    "pCOFINS": ("COFINS", "pCOFINS"),
+    "vCOFINS": ("COFINS", "vCOFINS"),
+}
+CAMPOS_TEXTO = {"NCM", "CFOP"}
+
+# Muda quando a mesma NF-e passa a ser lida com valores diferentes; entra no
+# nome das colunas gravadas em cache (servico_calculo) para não reaproveitar
+# leituras antigas.
+VERSAO_LEITURA = 2
+
+
+def _por_grupo(campos):
+    """{(tag do grupo, tag): valor} -> {tag do grupo: {tag: valor}}."""
+    indice = {}
+    for (grupo, tag), valor in campos.items():
+        indice.setdefault(grupo, {})[tag] = valor
+    return indice
+
+
+# Índices compilados tag do grupo -> {tag do campo: (coluna, conversor)}, para
+# que cada elemento do item seja resolvido com uma consulta ao dict.
+INDICE_CAMPOS = _por_grupo({
+    (f"{{{NS_NFE}}}{grupo}", f"{{{NS_NFE}}}{tag}"): (coluna, str if coluna in CAMPOS_TEXTO else float)
+    for coluna, (grupo, tag) in CAMPOS_ITEM.items()
+})
+INDICE_CABECALHO = _por_grupo(CAMPOS_CABECALHO)
+
+# Colunas numéricas de cada grupo de tributo. Grupo presente sem alíquota ou
+# valor (ICMS40/41/50, IPINT, PISNT, COFINSNT...) é item isento ou não
+# tributado: esses campos ficam 0, não NaN. NaN fica só para o grupo ausente.
+ZERADOS_POR_GRUPO = {
+    f"{{{NS_NFE}}}{grupo}": tuple(coluna for coluna, (g, _) in CAMPOS_ITEM.items() if g == grupo and coluna not in CAMPOS_TEXTO)
+    for grupo in {g for g, _ in CAMPOS_ITEM.values() if g != "prod"}
+}
+
+
+def _coluna_vazia(campo, quantidade):
+    if campo in CAMPOS_TEXTO:
+        return np.full(quantidade, "", dtype=object)
+    return np.full(quantidade, np.nan)
+
+
+def _ler_grupo(item, grupo):
+    campos = INDICE_CAMPOS.get(grupo.tag)
+    if campos is None:
+        return
+    for elem in grupo.iter():
+        campo = campos.get(elem.tag)
+        if campo is not None and elem.text and campo[0] not in item:
+            coluna, conversor = campo
+            item[coluna] = conversor(elem.text)
+    for coluna in ZERADOS_POR_GRUPO.get(grupo.tag, ()):
+        item.setdefault(coluna, 0.0)
+
+
+def iterar_itens(arquivo, cabecalho=None):
+    """Percorre os itens (det) de uma NF-e em modo streaming, um por vez.
+
+    O parser só emite o fim de cada elemento; quando um det termina, os
+    campos de CAMPOS_ITEM são extraídos do próprio det (prod e os grupos de
+    imposto) e ele é esvaziado em seguida. Fica só o elemento det vazio, de
+    poucas dezenas de bytes (a NF-e tem no máximo 990 itens), então a
+    memória não cresce com o conteúdo dos itens. Se `cabecalho` (dict) for
+    informado, recebe a data de emissão e o CNPJ do emitente no mesmo passo.
+    """
+    for _, elem in ET.iterparse(arquivo):
+        tag = elem.tag
+        if tag == TAG_DET:
+            item = {"nItem": elem.get("nItem")}
+            for grupo in elem:
+                if grupo.tag == TAG_IMPOSTO:
+                    for tributo in grupo:
+                        _ler_grupo(item, tributo)
+                else:
+                    _ler_grupo(item, grupo)
+            if "vProd" in item:
+                yield item
+            elem.clear()
+        elif cabecalho is not None and tag in INDICE_CABECALHO:
+            for filho in elem:
+                campo = INDICE_CABECALHO[tag].get(filho.tag)
+                if campo is not None and filho.text:
+                    cabecalho.setdefault(campo, filho.text)
+
+
+def ler_colunas(arquivo):
+    """Lê todos os itens de uma NF-e em colunas NumPy (somente leitura).
+
+    Campos numéricos ficam como NaN quando o grupo do tributo não existe no
+    item e 0 quando o grupo existe sem o campo (isento, não tributado);
+    campos de texto ausentes ficam como "". A chave "cabecalho" traz os campos da nota (dhEmi, CNPJ do emitente).
+    """
+    cabecalho = {}
+    listas = {campo: [] for campo in CAMPOS_ITEM}
+    for item in iterar_itens(arquivo, cabecalho):
+        for campo, valores in listas.items():
+            valores.append(item.get(campo, "" if campo in CAMPOS_TEXTO else np.nan))
+
+    colunas = {}
+    for campo, valores in listas.items():
+        coluna = np.array(valores, dtype=object if campo in CAMPOS_TEXTO else np.float64)
+        coluna.flags.writeable = False
+        colunas[campo] = coluna
+    colunas["cabecalho"] = cabecalho
+    return colunas
+
+
+def concatenar_colunas(lista_colunas):
+    """Junta as colunas de vários arquivos; colunas ausentes viram NaN/""."""
+    resultado = {}
+    for campo in CAMPOS_ITEM:
+        partes = [
+            colunas[campo] if campo in colunas else _coluna_vazia(campo, len(colunas["vProd"]))
+            for colunas in lista_colunas
+        ]
+        resultado[campo] = np.concatenate(partes) if partes else _coluna_vazia(campo, 0)
+    return resultado
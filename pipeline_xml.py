@@ -0,0 +1,51 @@
+"""Leitura de XMLs de NF-e em segundo plano.
+
+O parsing roda em um pool de threads enquanto a thread do script do
+Streamlit consome os resultados à medida que ficam prontos e atualiza a
+tela (progresso, resumo parcial). A fila é limitada: no máximo
+`max_pendentes` arquivos ficam submetidos ao mesmo tempo, então o conteúdo
+em memória aguardando parsing não cresce com o tamanho do lote.
+
+Com um `servico` (servico_calculo.ServicoCalculo), arquivos que outra sessão
+já leu ou está lendo não são lidos de novo.
+"""
+import xml.etree.ElementTree as ET
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from io import BytesIO
+
+from leitor_nfe import ler_colunas
+
+
+def _ler(chave, conteudo, servico=None):
+    try:
+        if servico is None:
+            return chave, ler_colunas(BytesIO(conteudo)), None
+        colunas = servico.obter(("colunas", chave), lambda: ler_colunas(BytesIO(conteudo)), tipo="colunas")
+        return chave, colunas, None
+    except (ET.ParseError, ValueError) as erro:
+        return chave, None, str(erro)
+
+
+def ler_em_segundo_plano(arquivos, workers=4, max_pendentes=8, servico=None):
+    """Lê `arquivos` (iterável de (chave, conteúdo em bytes)) em threads.
+
+    Gera (chave, colunas, erro) na ordem em que os arquivos terminam;
+    `colunas` é None e `erro` traz a mensagem quando o XML é inválido.
+    """
+    arquivos = iter(arquivos)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="leitor_nfe") as executor:
+        pendentes = set()
+
+        def submeter():
+            proximo = next(arquivos, None)
+            if proximo is not None:
+                pendentes.add(executor.submit(_ler, *proximo, servico))
+
+        for _ in range(max_pendentes):
+            submeter()
+        while pendentes:
+            concluidos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                pendentes.discard(futuro)
+                submeter()
+                yield futuro.result()
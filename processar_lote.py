@@ -0,0 +1,158 @@
+"""Processamento em lote de XMLs de NF-e, sem interface.
+
+Exemplo:
+    python processar_lote.py exportacao_sefaz/ --perfil perfil.json --saida resultado/ --workers 8
+
+O perfil é um JSON com as alíquotas em percentual (chaves de Aliquotas:
+ii, pis, cofins, ipi, icms, ibs, cbs, isel); chaves ausentes valem zero.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+from functools import partial
+
+import pandas as pd
+
+from calculo_tributos import Aliquotas, calcular_itens_xml, resumo_itens
+from exportacao import gravar_excel, gravar_parquet
+from leitor_nfe import ler_colunas
+from tabela_ncm import carregar_tabela
+
+FORMATOS = ("csv", "parquet", "xlsx")
+
+
+def listar_arquivos(entradas):
+    """Expande diretórios (recursivamente) e padrões glob em caminhos de XML."""
+    arquivos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            padrao = os.path.join(entrada, "**", "*.xml")
+            arquivos.extend(glob.glob(padrao, recursive=True))
+        else:
+            arquivos.extend(glob.glob(entrada, recursive=True))
+    return sorted(set(arquivos))
+
+
+def carregar_perfil(caminho):
+    if caminho is None:
+        return Aliquotas()
+    with open(caminho, "r", encoding="utf-8") as f:
+        dados = json.load(f)
+    if not isinstance(dados, dict):
+        raise ValueError("O perfil deve ser um objeto JSON com as alíquotas.")
+    validas = {campo.name for campo in fields(Aliquotas)}
+    desconhecidas = set(dados) - validas
+    if desconhecidas:
+        raise ValueError(f"Chaves desconhecidas no perfil: {', '.join(sorted(desconhecidas))}")
+    try:
+        return Aliquotas(**{chave: float(valor) for chave, valor in dados.items()})
+    except (TypeError, ValueError):
+        raise ValueError("As alíquotas do perfil devem ser números.") from None
+
+
+def processar_arquivo(caminho, aliquotas, indice_ncm=None):
+    """Lê e calcula um XML. Retorna (caminho, df_itens, erro)."""
+    try:
+        with open(caminho, "rb") as f:
+            colunas = ler_colunas(f)
+    except (ET.ParseError, OSError, ValueError) as erro:
+        return caminho, None, str(erro)
+
+    if indice_ncm is not None:
+        aliquotas, regime = indice_ncm.aliquotas_por_item(colunas["NCM"], aliquotas)
+    df = calcular_itens_xml(colunas["vProd"], aliquotas, colunas)
+    if indice_ncm is not None:
+        df.insert(df.columns.get_loc("Valor do Produto"), "Regime NCM", regime)
+    df.insert(0, "Arquivo", os.path.basename(caminho))
+    return caminho, df, None
+
+
+def processar_lote(arquivos, aliquotas, workers=None, chunksize=16, indice_ncm=None):
+    """Processa os arquivos em um pool de processos.
+
+    Retorna (df_xml, df_resumo_xml, erros), onde erros é uma lista de
+    (caminho, mensagem) dos arquivos que não puderam ser lidos.
+    """
+    partes = []
+    erros = []
+    tarefa = partial(processar_arquivo, aliquotas=aliquotas, indice_ncm=indice_ncm)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for caminho, df, erro in executor.map(tarefa, arquivos, chunksize=chunksize):
+            if erro is not None:
+                erros.append((caminho, erro))
+            elif not df.empty:
+                partes.append(df)
+
+    if partes:
+        df_xml = pd.concat(partes, ignore_index=True)
+    else:
+        df_xml = calcular_itens_xml([], aliquotas)
+        df_xml.insert(0, "Arquivo", pd.Series(dtype=str))
+    return df_xml, resumo_itens(df_xml), erros
+
+
+def gravar(df, caminho_base, formato, planilha):
+    """Grava `df` no formato; `planilha` é o nome da aba no Excel."""
+    caminho = f"{caminho_base}.{formato}"
+    if formato == "csv":
+        df.to_csv(caminho, index=False)
+    elif formato == "parquet":
+        gravar_parquet(caminho, df)
+    else:
+        gravar_excel(caminho, {planilha: df})
+    return caminho
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalcula o impacto da reforma tributária sobre lotes de XML de NF-e.")
+    parser.add_argument("entradas", nargs="+", help="Diretórios ou padrões glob de arquivos XML.")
+    parser.add_argument("--perfil", help="Arquivo JSON com as alíquotas (%%).")
+    parser.add_argument("--tabela-ncm", help="Tabela de alíquotas de IBS/CBS/IS por NCM (CSV ou Parquet).")
+    parser.add_argument("--saida", default=".", help="Diretório de saída (padrão: diretório atual).")
+    parser.add_argument("--formato", choices=FORMATOS, default="csv", help="Formato dos arquivos gerados.")
+    parser.add_argument("--workers", type=int, default=None, help="Número de processos (padrão: núcleos da máquina).")
+    parser.add_argument("--chunksize", type=int, default=16, help="Arquivos enviados a cada processo por vez.")
+    args = parser.parse_args(argv)
+
+    arquivos = listar_arquivos(args.entradas)
+    if not arquivos:
+        parser.error("nenhum arquivo XML encontrado nas entradas informadas")
+    # JSONDecodeError é um ValueError.
+    try:
+        aliquotas = carregar_perfil(args.perfil)
+    except (OSError, ValueError) as erro:
+        parser.error(f"perfil inválido ({args.perfil}): {erro}")
+    try:
+        indice_ncm = carregar_tabela(args.tabela_ncm) if args.tabela_ncm else None
+    except (OSError, ValueError) as erro:
+        parser.error(f"tabela de NCM inválida ({args.tabela_ncm}): {erro}")
+
+    inicio = time.perf_counter()
+    df_xml, df_resumo_xml, erros = processar_lote(arquivos, aliquotas, args.workers, args.chunksize, indice_ncm)
+    duracao = time.perf_counter() - inicio
+
+    os.makedirs(args.saida, exist_ok=True)
+    caminho_itens = gravar(df_xml, os.path.join(args.saida, "itens_xml"), args.formato, "Itens")
+    caminho_resumo = gravar(df_resumo_xml, os.path.join(args.saida, "resumo_xml"), args.formato, "Resumo XML")
+
+    for caminho, erro in erros:
+        print(f"Aviso: {caminho} ignorado ({erro})", file=sys.stderr)
+
+    processados = len(arquivos) - len(erros)
+    print(f"Itens: {caminho_itens}")
+    print(f"Resumo: {caminho_resumo}")
+    print(
+        f"{processados} arquivos, {len(df_xml)} itens em {duracao:.2f} s "
+        f"({processados / duracao:,.1f} arquivos/s, {len(df_xml) / duracao:,.1f} itens/s)"
+    )
+    return 1 if erros and not processados else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Relatório PDF consolidado (simulação, resumo XML e detalhe dos itens).
+
+As tabelas são desenhadas em lote: os valores de cada coluna são formatados
+de uma vez com pandas e o desenho percorre listas já prontas, sem
+iterrows(). O cabeçalho da tabela é repetido em cada página, então o
+detalhe dos itens ocupa quantas páginas forem necessárias. O tempo de
+geração de cada seção é medido e devolvido junto com o arquivo.
+"""
+import time
+from datetime import datetime
+
+import pandas as pd
+from fpdf import FPDF
+
+from calculo_tributos import COLUNA_ANTES, COLUNA_APOS, totais_por_item
+
+MAX_ITENS_DETALHE = 20_000
+ALTURA_LINHA = 6
+
+
+def _latin1(texto):
+    # As fontes padrão do FPDF 1.7 só aceitam Latin-1.
+    return str(texto).encode("latin-1", "replace").decode("latin-1")
+
+
+def _moeda(serie):
+    return serie.map("R$ {:,.2f}".format)
+
+
+class RelatorioPDF(FPDF):
+    """FPDF com cabeçalho/rodapé do relatório e tabelas em lote."""
+
+    titulo = "Relatório Comparativo de Tributos"
+
+    def header(self):
+        self.set_font("Arial", "B", 12)
+        self.cell(0, 8, _latin1(self.titulo), ln=True, align="C")
+        self.ln(2)
+
+    def footer(self):
+        self.set_y(-12)
+        self.set_font("Arial", "", 8)
+        self.cell(0, 6, _latin1(f"Gerado em {datetime.now():%d/%m/%Y %H:%M} - página {self.page_no()}/{{nb}}"), align="C")
+
+    def secao(self, titulo):
+        if self.get_y() + 3 * ALTURA_LINHA > self.page_break_trigger:
+            self.add_page()
+        self.set_font("Arial", "B", 11)
+        self.cell(0, 8, _latin1(titulo), ln=True)
+
+    def tabela(self, colunas, larguras, alinhamentos):
+        """Desenha {título: lista de textos} com cabeçalho repetido a cada página.
+
+        Se a soma de `larguras` passar da área útil da página, as colunas são
+        reduzidas na mesma proporção.
+        """
+        util = self.w - self.l_margin - self.r_margin
+        if sum(larguras) > util:
+            larguras = [largura * util / sum(larguras) for largura in larguras]
+        titulos = [_latin1(titulo) for titulo in colunas]
+        linhas = zip(*[[_latin1(valor) for valor in valores] for valores in colunas.values()])
+
+        def cabecalho():
+            self.set_font("Arial", "B", 8)
+            self.set_fill_color(230, 230, 230)
+            for titulo, largura in zip(titulos, larguras):
+                self.cell(largura, ALTURA_LINHA, titulo, border=1, align="C", fill=True)
+            self.ln()
+            self.set_font("Arial", "", 8)
+
+        cabecalho()
+        for linha in linhas:
+            if self.get_y() + ALTURA_LINHA > self.page_break_trigger:
+                self.add_page()
+                cabecalho()
+            for valor, largura, alinhamento in zip(linha, larguras, alinhamentos):
+                self.cell(largura, ALTURA_LINHA, valor, border=1, align=alinhamento)
+            self.ln()
+        self.ln(4)
+
+
+def _tabela_resumo(pdf, resumo):
+    pdf.tabela(
+        {"Tributo": resumo["Tributo"].tolist(), COLUNA_APOS: _moeda(resumo[COLUNA_APOS]).tolist(), COLUNA_ANTES: _moeda(resumo[COLUNA_ANTES]).tolist()},
+        larguras=[40, 70, 70],
+        alinhamentos=["L", "R", "R"],
+    )
+
+
+def _tabela_itens(pdf, df_xml, max_itens):
+    itens = df_xml.iloc[:max_itens]
+    antes, apos = totais_por_item(itens)
+    colunas = {"Item": [str(i) for i in range(1, len(itens) + 1)]}
+    for coluna in ("NCM", "CFOP", "Regime NCM"):
+        if coluna in itens:
+            colunas[coluna] = itens[coluna].astype(str).tolist()
+    colunas["Valor do Produto"] = _moeda(itens["Valor do Produto"]).tolist()
+    colunas["Tributos Antes"] = _moeda(pd.Series(antes)).tolist()
+    colunas["Tributos Após"] = _moeda(pd.Series(apos)).tolist()
+    colunas["Diferença"] = _moeda(pd.Series(apos - antes)).tolist()
+    larguras = {"Item": 12, "NCM": 20, "CFOP": 14, "Regime NCM": 40}
+    pdf.tabela(
+        colunas,
+        larguras=[larguras.get(titulo, 30) for titulo in colunas],
+        alinhamentos=["R" if titulo not in ("NCM", "CFOP", "Regime NCM") else "L" for titulo in colunas],
+    )
+
+
+def gerar_relatorio(caminho, comparativo_simulacao=None, resumo_xml=None, df_xml=None, max_itens=MAX_ITENS_DETALHE):
+    """Grava o PDF em `caminho` e devolve {seção: segundos gastos}."""
+    tempos = {}
+    inicio = time.perf_counter()
+
+    def medir(secao):
+        nonlocal inicio
+        agora = time.perf_counter()
+        tempos[secao] = agora - inicio
+        inicio = agora
+
+    pdf = RelatorioPDF()
+    pdf.alias_nb_pages()
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.add_page()
+    medir("Abertura")
+
+    if comparativo_simulacao is not None:
+        pdf.secao("Simulação Manual")
+        _tabela_resumo(pdf, comparativo_simulacao)
+        medir("Simulação Manual")
+
+    if resumo_xml is not None:
+        pdf.secao("Resumo XML")
+        _tabela_resumo(pdf, resumo_xml)
+        medir("Resumo XML")
+
+    if df_xml is not None and len(df_xml):
+        pdf.secao(f"Itens do XML ({len(df_xml):,} itens)")
+        if len(df_xml) > max_itens:
+            pdf.set_font("Arial", "I", 8)
+            pdf.cell(0, 5, _latin1(f"Mostrando os primeiros {max_itens:,} itens; a lista completa está na exportação em Excel/CSV/Parquet."), ln=True)
+        _tabela_itens(pdf, df_xml, max_itens)
+        medir("Itens do XML")
+
+    pdf.output(caminho, "F")
+    medir("Gravação do arquivo")
+    return tempos
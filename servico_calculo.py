@@ -0,0 +1,211 @@
+"""Resultados compartilhados entre as sessões do app, no mesmo processo.
+
+Cada sessão do Streamlit roda em uma thread do mesmo processo; este serviço
+guarda resultados pela chave do trabalho (hash do XML, ou hash do XML +
+perfil de alíquotas, um arquivo por entrada) para que sessões que enviam os
+mesmos arquivos e perfis, em qualquer ordem, não repitam o parsing nem o
+cálculo. Se duas sessões pedem a mesma chave ao
+mesmo tempo, só uma calcula e a outra espera o resultado.
+
+Os resultados são compartilhados somente para leitura (arrays com
+writeable=False; DataFrames não devem ser alterados no lugar). A memória é
+limitada por `limite_bytes`, com descarte do resultado usado há mais tempo.
+Com `diretorio`, as colunas lidas dos XMLs também são gravadas em Parquet e
+sobrevivem a reinícios do processo; o cálculo a partir delas é barato e fica
+só em memória.
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from leitor_nfe import CAMPOS_ITEM, CAMPOS_TEXTO, VERSAO_LEITURA
+
+LIMITE_PADRAO_MB = 1024
+VARIAVEL_LIMITE = "REFORMA_CACHE_MB"
+VARIAVEL_DIRETORIO = "REFORMA_CACHE_DIR"
+
+# Tamanho médio estimado de cada str em arrays de objetos (NCM, CFOP).
+BYTES_POR_TEXTO = 60
+
+
+def tamanho_bytes(valor):
+    """Estimativa da memória ocupada por um resultado."""
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes + (valor.size * BYTES_POR_TEXTO if valor.dtype == object else 0)
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, dict):
+        return sum(tamanho_bytes(v) for v in valor.values())
+    if isinstance(valor, (tuple, list)):
+        return sum(tamanho_bytes(v) for v in valor)
+    if dataclasses.is_dataclass(valor):
+        return sum(tamanho_bytes(getattr(valor, campo.name)) for campo in dataclasses.fields(valor))
+    return sys.getsizeof(valor)
+
+
+def _gravar_colunas(caminho, colunas):
+    tabela = pa.table({
+        campo: pa.array(colunas[campo], pa.string() if campo in CAMPOS_TEXTO else pa.float64())
+        for campo in CAMPOS_ITEM if campo in colunas
+    })
+    tabela = tabela.replace_schema_metadata({"cabecalho": json.dumps(colunas.get("cabecalho", {}))})
+    temporario = f"{caminho}.{threading.get_ident()}.tmp"
+    pq.write_table(tabela, temporario)
+    os.replace(temporario, caminho)
+
+
+def _ler_colunas(caminho):
+    tabela = pq.read_table(caminho, memory_map=True)
+    colunas = {}
+    for campo in tabela.column_names:
+        coluna = tabela.column(campo).to_numpy(zero_copy_only=False)
+        coluna = coluna.astype(object) if campo in CAMPOS_TEXTO else coluna.astype(np.float64, copy=False)
+        coluna.flags.writeable = False
+        colunas[campo] = coluna
+    metadados = tabela.schema.metadata or {}
+    colunas["cabecalho"] = json.loads(metadados.get(b"cabecalho", b"{}"))
+    return colunas
+
+
+# Tipos de resultado que podem ir para o disco: tipo -> (gravar, ler).
+FORMATOS_DISCO = {"colunas": (_gravar_colunas, _ler_colunas)}
+
+
+class ServicoCalculo:
+    """Cache LRU de resultados, com limite de memória e deduplicação em andamento."""
+
+    def __init__(self, limite_bytes, diretorio=None):
+        self.limite_bytes = limite_bytes
+        self.diretorio = diretorio
+        self._dados = OrderedDict()
+        self._tamanhos = {}
+        self._em_andamento = {}
+        self._trava = threading.Lock()
+        self.bytes_em_uso = 0
+        self.contadores = {"acertos": 0, "acertos_disco": 0, "calculos": 0, "deduplicados": 0, "descartes": 0}
+
+    def __len__(self):
+        return len(self._dados)
+
+    def __contains__(self, chave):
+        return chave in self._dados
+
+    def _caminho(self, tipo, chave):
+        nome = hashlib.sha256(repr((VERSAO_LEITURA, chave)).encode("utf-8")).hexdigest()
+        return os.path.join(self.diretorio, tipo, f"{nome}.parquet")
+
+    def consultar(self, chave, tipo=None):
+        """Resultado já disponível (memória ou disco) ou None, sem calcular."""
+        with self._trava:
+            if chave in self._dados:
+                self._dados.move_to_end(chave)
+                self.contadores["acertos"] += 1
+                return self._dados[chave]
+        valor = self._ler_disco(tipo, chave)
+        if valor is not None:
+            tamanho = tamanho_bytes(valor)
+            with self._trava:
+                self.contadores["acertos_disco"] += 1
+                self._guardar(chave, valor, tamanho)
+        return valor
+
+    def obter(self, chave, calcular, tipo=None):
+        """Resultado de `chave`, calculado por `calcular()` só se ninguém o tiver.
+
+        `tipo` (uma chave de FORMATOS_DISCO) habilita a cópia em disco.
+        Exceções de `calcular` chegam a todas as sessões que aguardavam a
+        mesma chave, e nada é guardado.
+        """
+        with self._trava:
+            if chave in self._dados:
+                self._dados.move_to_end(chave)
+                self.contadores["acertos"] += 1
+                return self._dados[chave]
+            pendente = self._em_andamento.get(chave)
+            dono = pendente is None
+            if dono:
+                pendente = self._em_andamento[chave] = Future()
+            else:
+                self.contadores["deduplicados"] += 1
+        if not dono:
+            return pendente.result()
+
+        try:
+            valor = self._ler_disco(tipo, chave)
+            do_disco = valor is not None
+            if not do_disco:
+                valor = calcular()
+                self._gravar_disco(tipo, chave, valor)
+            tamanho = tamanho_bytes(valor)
+        except BaseException as erro:
+            with self._trava:
+                del self._em_andamento[chave]
+            pendente.set_exception(erro)
+            raise
+        with self._trava:
+            self.contadores["acertos_disco" if do_disco else "calculos"] += 1
+            self._guardar(chave, valor, tamanho)
+            del self._em_andamento[chave]
+        pendente.set_result(valor)
+        return valor
+
+    def _guardar(self, chave, valor, tamanho):
+        # Chamado com a trava adquirida. Resultados maiores que o limite
+        # inteiro são devolvidos à sessão mas não ficam em cache.
+        if tamanho > self.limite_bytes:
+            return
+        if chave in self._dados:
+            self.bytes_em_uso -= self._tamanhos[chave]
+        self._dados[chave] = valor
+        self._dados.move_to_end(chave)
+        self._tamanhos[chave] = tamanho
+        self.bytes_em_uso += tamanho
+        while self.bytes_em_uso > self.limite_bytes:
+            antiga, _ = self._dados.popitem(last=False)
+            self.bytes_em_uso -= self._tamanhos.pop(antiga)
+            self.contadores["descartes"] += 1
+
+    def _ler_disco(self, tipo, chave):
+        if self.diretorio is None or tipo not in FORMATOS_DISCO:
+            return None
+        caminho = self._caminho(tipo, chave)
+        if not os.path.exists(caminho):
+            return None
+        try:
+            return FORMATOS_DISCO[tipo][1](caminho)
+        except (OSError, ValueError):
+            # Arquivo corrompido ou de outra versão: recalcula e sobrescreve.
+            return None
+
+    def _gravar_disco(self, tipo, chave, valor):
+        if self.diretorio is None or tipo not in FORMATOS_DISCO:
+            return
+        caminho = self._caminho(tipo, chave)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        FORMATOS_DISCO[tipo][0](caminho, valor)
+
+    def estatisticas(self):
+        with self._trava:
+            return {
+                "entradas": len(self._dados),
+                "em_andamento": len(self._em_andamento),
+                "mib_em_uso": self.bytes_em_uso / 2**20,
+                "mib_limite": self.limite_bytes / 2**20,
+                **self.contadores,
+            }
+
+
+def servico_do_ambiente():
+    """Serviço configurado por REFORMA_CACHE_MB e REFORMA_CACHE_DIR."""
+    limite_mb = float(os.environ.get(VARIAVEL_LIMITE, LIMITE_PADRAO_MB))
+    return ServicoCalculo(int(limite_mb * 2**20), os.environ.get(VARIAVEL_DIRETORIO) or None)
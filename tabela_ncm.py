@@ -0,0 +1,136 @@
+"""Tabela de alíquotas de IBS/CBS/IS por NCM.
+
+A tabela (CSV ou Parquet) associa prefixos de NCM a um regime:
+
+    ncm,regime,ibs,cbs,isel,reducao
+    22,Bebidas,,,10,
+    3004,Medicamentos,,,,60
+    10063021,Arroz (cesta básica),0,0,,
+
+Colunas vazias usam a alíquota padrão da tela; `reducao` (%) reduz o IBS e a
+CBS resultantes. Cada item recebe a linha do prefixo mais longo que casa com
+o seu NCM. A resolução é vetorizada: um searchsorted por tamanho de prefixo
+sobre arrays ordenados, para todos os itens de uma vez.
+"""
+import csv
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+# Separadores aceitos no CSV e quantos bytes do início são usados para detectá-lo.
+SEPARADORES_CSV = ",;\t|"
+TAMANHO_AMOSTRA_CSV = 64 * 1024
+
+DIGITOS_NCM = 8
+COLUNAS_ALIQUOTA = ["ibs", "cbs", "isel", "reducao"]
+SEM_REGIME = "Padrão"
+
+
+def _ncm_para_inteiro(ncms):
+    """NCMs (texto, com ou sem pontos) em inteiros de 8 dígitos; -1 se inválido."""
+    texto = pd.Series(ncms, dtype=object).fillna("").astype(str).str.replace(r"\D", "", regex=True)
+    validos = texto.str.len() == DIGITOS_NCM
+    inteiros = np.full(len(texto), -1, dtype=np.int64)
+    inteiros[validos.to_numpy()] = texto[validos].astype(np.int64).to_numpy()
+    return inteiros
+
+
+class IndiceNCM:
+    """Índice de prefixo mais longo sobre a tabela de alíquotas por NCM."""
+
+    def __init__(self, tabela):
+        tabela = tabela.copy()
+        tabela["ncm"] = tabela["ncm"].astype(str).str.replace(r"\D", "", regex=True)
+        tabela = tabela[(tabela["ncm"].str.len() >= 1) & (tabela["ncm"].str.len() <= DIGITOS_NCM)]
+        tabela = tabela.drop_duplicates("ncm", keep="last").reset_index(drop=True)
+        if "regime" not in tabela:
+            tabela["regime"] = tabela["ncm"]
+        for coluna in COLUNAS_ALIQUOTA:
+            tabela[coluna] = pd.to_numeric(tabela[coluna], errors="coerce") if coluna in tabela else np.nan
+        self.tabela = tabela
+
+        # Por tamanho de prefixo (do mais longo ao mais curto): prefixos
+        # ordenados e a linha da tabela correspondente a cada um.
+        self._niveis = []
+        tamanhos = tabela["ncm"].str.len()
+        for tamanho in sorted(tamanhos.unique(), reverse=True):
+            linhas = np.flatnonzero(tamanhos.to_numpy() == tamanho)
+            prefixos = tabela["ncm"].to_numpy()[linhas].astype(np.int64)
+            ordem = np.argsort(prefixos)
+            self._niveis.append((int(tamanho), prefixos[ordem], linhas[ordem]))
+
+    def __len__(self):
+        return len(self.tabela)
+
+    def resolver(self, ncms):
+        """Linha da tabela para cada NCM (-1 quando nenhum prefixo casa)."""
+        inteiros = _ncm_para_inteiro(ncms)
+        linhas = np.full(len(inteiros), -1, dtype=np.int64)
+        pendentes = inteiros >= 0
+        for tamanho, prefixos, linhas_nivel in self._niveis:
+            if not pendentes.any():
+                break
+            chaves = inteiros[pendentes] // 10 ** (DIGITOS_NCM - tamanho)
+            posicoes = np.searchsorted(prefixos, chaves)
+            posicoes_validas = np.minimum(posicoes, len(prefixos) - 1)
+            casou = prefixos[posicoes_validas] == chaves
+            indices = np.flatnonzero(pendentes)[casou]
+            linhas[indices] = linhas_nivel[posicoes_validas[casou]]
+            pendentes[indices] = False
+        return linhas
+
+    def aliquotas_por_item(self, ncms, aliquotas):
+        """Aliquotas com arrays por item de IBS, CBS e IS, e o regime de cada item.
+
+        Itens sem NCM na tabela (ou com campo vazio) ficam com a alíquota de
+        `aliquotas`.
+        """
+        linhas = self.resolver(ncms)
+        encontrados = linhas >= 0
+        if not encontrados.any():
+            return aliquotas, np.full(len(linhas), SEM_REGIME, dtype=object)
+        linhas_validas = np.where(encontrados, linhas, 0)
+
+        def coluna(nome, padrao):
+            valores = self.tabela[nome].to_numpy(dtype=np.float64)[linhas_validas]
+            return np.where(encontrados & ~np.isnan(valores), valores, padrao)
+
+        fator = 1 - coluna("reducao", 0.0) / 100
+        regime = np.where(encontrados, self.tabela["regime"].to_numpy(dtype=object)[linhas_validas], SEM_REGIME)
+        return replace(
+            aliquotas,
+            ibs=coluna("ibs", aliquotas.ibs) * fator,
+            cbs=coluna("cbs", aliquotas.cbs) * fator,
+            isel=coluna("isel", aliquotas.isel),
+        ), regime
+
+
+def _separador_csv(arquivo):
+    """Separador do CSV entre SEPARADORES_CSV; ";" se não for possível detectar."""
+    if hasattr(arquivo, "read"):
+        amostra = arquivo.read(TAMANHO_AMOSTRA_CSV)
+        arquivo.seek(0)
+    else:
+        with open(arquivo, "rb") as f:
+            amostra = f.read(TAMANHO_AMOSTRA_CSV)
+    if isinstance(amostra, bytes):
+        amostra = amostra.decode("utf-8", errors="replace")
+    try:
+        return csv.Sniffer().sniff(amostra, delimiters=SEPARADORES_CSV).delimiter
+    except csv.Error:
+        # Arquivo vazio, uma coluna só etc.: ";" é o padrão das planilhas em português.
+        return ";"
+
+
+def carregar_tabela(arquivo, nome=None):
+    """Lê a tabela de um CSV ou Parquet (pelo nome/extensão) e monta o índice."""
+    nome = (nome or getattr(arquivo, "name", None) or str(arquivo)).lower()
+    if nome.endswith(".parquet"):
+        tabela = pd.read_parquet(arquivo)
+    else:
+        tabela = pd.read_csv(arquivo, dtype={"ncm": str}, sep=_separador_csv(arquivo))
+    tabela.columns = [str(coluna).strip().lower() for coluna in tabela.columns]
+    if "ncm" not in tabela:
+        raise ValueError("A tabela de alíquotas precisa de uma coluna 'ncm'.")
+    return IndiceNCM(tabela)
@@ -0,0 +1,102 @@
+"""Projeção ano a ano da transição da reforma (2026–2033).
+
+O cronograma é uma tabela compacta (anos x tributos) com a fração da
+alíquota informada que vale em cada ano, ou uma alíquota fixa quando a lei
+a define (CBS/IBS de teste). A projeção aplica a tabela inteira de uma vez:
+oito anos sobre todos os itens são uma única operação com broadcast.
+"""
+import numpy as np
+import pandas as pd
+
+from calculo_tributos import TRIBUTOS
+
+ANOS = np.arange(2026, 2034)
+
+_II, _PIS, _COFINS, _IPI, _IS, _IBS, _CBS, _ICMS = range(len(TRIBUTOS))
+
+# Fração da alíquota informada em cada ano. Colunas na ordem de TRIBUTOS:
+#                      II  PIS COFINS IPI  IS   IBS  CBS  ICMS
+FATORES = np.array([
+    [1.0, 1.0, 1.0, 1.0, 0.0, 0.0, 0.0, 1.0],  # 2026: ano de teste
+    [1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 1.0, 1.0],  # 2027: CBS plena, PIS/COFINS extintos, IPI zero
+    [1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 1.0, 1.0],  # 2028
+    [1.0, 0.0, 0.0, 0.0, 1.0, 0.1, 1.0, 0.9],  # 2029: início da troca ICMS -> IBS
+    [1.0, 0.0, 0.0, 0.0, 1.0, 0.2, 1.0, 0.8],  # 2030
+    [1.0, 0.0, 0.0, 0.0, 1.0, 0.3, 1.0, 0.7],  # 2031
+    [1.0, 0.0, 0.0, 0.0, 1.0, 0.4, 1.0, 0.6],  # 2032
+    [1.0, 0.0, 0.0, 0.0, 1.0, 1.0, 1.0, 0.0],  # 2033: ICMS extinto, IBS pleno
+])
+
+# Alíquotas fixas (%) definidas em lei; NaN indica que vale FATORES.
+ALIQUOTAS_FIXAS = np.full(FATORES.shape, np.nan)
+ALIQUOTAS_FIXAS[0, _CBS] = 0.9
+ALIQUOTAS_FIXAS[0:3, _IBS] = 0.1
+
+
+def cronograma(zfm=False):
+    """Tabela (FATORES, ALIQUOTAS_FIXAS); na Zona Franca de Manaus o IPI é mantido."""
+    fatores = FATORES
+    if zfm:
+        fatores = FATORES.copy()
+        fatores[:, _IPI] = 1.0
+    return fatores, ALIQUOTAS_FIXAS
+
+
+def taxas_efetivas(aliquotas, zfm=False):
+    """Alíquotas (fração) de cada ano e tributo: forma (..., anos, tributos).
+
+    Campos de `aliquotas` podem ser escalares ou arrays por item (n,).
+    """
+    fatores, fixas = cronograma(zfm)
+    informadas = np.stack(np.broadcast_arrays(
+        aliquotas.ii, aliquotas.pis, aliquotas.cofins, aliquotas.ipi,
+        aliquotas.isel, aliquotas.ibs, aliquotas.cbs, aliquotas.icms,
+    ), axis=-1).astype(np.float64)[..., None, :]
+    return np.where(np.isnan(fixas), fatores * informadas, fixas) / 100
+
+
+def projetar_itens(base, aliquotas, zfm=False, outros=0.0):
+    """Valor de cada tributo por item e ano: array (itens, anos, tributos).
+
+    II, PIS, COFINS, IPI, IS e ICMS incidem sobre a base; IBS e CBS sobre
+    base + II + IS + outros, como em calculo_tributos.calcular_apos_reforma.
+    """
+    base = np.atleast_1d(np.asarray(base, dtype=np.float64))[:, None]
+    taxas = taxas_efetivas(aliquotas, zfm)
+    if taxas.ndim == 2:
+        taxas = taxas[None, :, :]
+
+    valores = base[..., None] * taxas
+    base_ibs_cbs = base + valores[..., _II] + valores[..., _IS] + outros
+    valores[..., _IBS] = base_ibs_cbs * taxas[..., _IBS]
+    valores[..., _CBS] = base_ibs_cbs * taxas[..., _CBS]
+    return valores
+
+
+def _escalares(aliquotas):
+    return all(np.ndim(valor) == 0 for valor in vars(aliquotas).values())
+
+
+def projetar_total(base, aliquotas, zfm=False, outros=0.0, tamanho_lote=100_000):
+    """Matriz ano x tributo somada sobre todos os itens, com coluna TOTAL.
+
+    Com alíquotas únicas, todos os tributos são lineares na base e a soma
+    dos itens pode ser projetada diretamente. Com alíquotas por item, os
+    itens são projetados em lotes para limitar a memória.
+    """
+    base = np.atleast_1d(np.asarray(base, dtype=np.float64))
+    if _escalares(aliquotas):
+        matriz = projetar_itens(base.sum(), aliquotas, zfm, outros * len(base))[0]
+    else:
+        matriz = np.zeros(FATORES.shape)
+        for inicio in range(0, len(base), tamanho_lote):
+            fatia = slice(inicio, inicio + tamanho_lote)
+            matriz += projetar_itens(base[fatia], aliquotas.selecionar(fatia), zfm, outros).sum(axis=0)
+    return tabela_anos(matriz)
+
+
+def tabela_anos(matriz):
+    """DataFrame ano x tributo (com TOTAL) a partir de uma matriz (anos, tributos)."""
+    df = pd.DataFrame(matriz, index=pd.Index(ANOS, name="Ano"), columns=TRIBUTOS)
+    df["TOTAL"] = matriz.sum(axis=1)
+    return df
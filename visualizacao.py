@@ -0,0 +1,47 @@
+"""Visualização paginada da tabela de itens do XML.
+
+Filtro, ordenação e totais são calculados no servidor com pandas/NumPy e só
+a página visível é enviada ao navegador, então o volume de cada rerun não
+depende do tamanho da tabela.
+"""
+import numpy as np
+
+COLUNAS_FILTRO = ["NCM", "CFOP", "Regime NCM"]
+
+
+def filtrar(df, texto):
+    """Índices das linhas cujo NCM, CFOP ou regime contém `texto`."""
+    if not texto:
+        return np.arange(len(df))
+    mascara = np.zeros(len(df), dtype=bool)
+    for coluna in COLUNAS_FILTRO:
+        if coluna in df:
+            mascara |= df[coluna].astype(str).str.contains(texto, case=False, regex=False).to_numpy()
+    return np.flatnonzero(mascara)
+
+
+def paginar(df, pagina=1, tamanho_pagina=100, filtro=None, ordenar_por=None, ascendente=True, totais=None):
+    """Retorna (página, linhas filtradas, total de páginas, totais numéricos).
+
+    A ordenação é feita sobre os índices da coluna escolhida (argsort), sem
+    reordenar a tabela inteira; só as linhas da página são copiadas. Sem
+    filtro, `totais` já calculados (ex.: do AgregadorResumo) são reaproveitados.
+    """
+    indices = filtrar(df, filtro)
+    if ordenar_por is not None and ordenar_por in df:
+        valores = df[ordenar_por].to_numpy()[indices]
+        ordem = np.argsort(valores, kind="stable")
+        if not ascendente:
+            ordem = ordem[::-1]
+        indices = indices[ordem]
+
+    total_linhas = len(indices)
+    total_paginas = max(1, -(-total_linhas // tamanho_pagina))
+    pagina = min(max(1, pagina), total_paginas)
+    inicio = (pagina - 1) * tamanho_pagina
+    pagina_df = df.iloc[indices[inicio:inicio + tamanho_pagina]]
+
+    if totais is None or filtro:
+        numericas = df.select_dtypes("number")
+        totais = numericas.sum() if total_linhas == len(df) else numericas.iloc[indices].sum()
+    return pagina_df, total_linhas, total_paginas, totais